@@ -17,6 +17,7 @@ from django.db.models import F
 
 
 
+from apps.orders.idempotency import idempotent
 from apps.orders.models import PaymentOrder
 from .models import (
     Booking,
@@ -47,6 +48,7 @@ razorpay_client = razorpay.Client(
 # EXPERIENCE BOOKING (PAYMENT FIRST)
 # =========================
 
+@method_decorator(idempotent, name="post")
 class CreateBookingView(APIView):
     def post(self, request):
         serializer = BookingSerializer(data=request.data)
@@ -360,6 +362,7 @@ class ListExperienceSlotsByDateView(APIView):
 # WORKSHOP REGISTRATION (PAYMENT FIRST)
 # =========================
 
+@method_decorator(idempotent, name="post")
 class CreateWorkshopRegistrationView(APIView):
     def post(self, request):
         serializer = WorkshopRegistrationSerializer(data=request.data)
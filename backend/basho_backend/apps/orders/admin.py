@@ -9,6 +9,7 @@ from .models import (
     OrderItem,
     Payment,
     Transaction,
+    StockHold,
 )
 
 # =========================
@@ -23,10 +24,10 @@ class CartItemInline(admin.TabularInline):
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
-    list_display = ("id", "user", "is_active", "created_at")
+    list_display = ("id", "user", "is_active", "item_count", "subtotal", "created_at")
     list_filter = ("is_active", "created_at")
     search_fields = ("user__email", "user__username")
-    readonly_fields = ("created_at",)
+    readonly_fields = ("created_at", "item_count", "subtotal", "total_weight", "version")
     inlines = [CartItemInline]
 
 
@@ -82,6 +83,26 @@ class OrderAdmin(admin.ModelAdmin):
     inlines = [OrderItemInline]
 
 
+# =========================
+# STOCK HOLDS
+# =========================
+
+@admin.register(StockHold)
+class StockHoldAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "product",
+        "quantity",
+        "payment_order",
+        "status",
+        "expires_at",
+        "created_at",
+    )
+    list_filter = ("status", "created_at")
+    search_fields = ("product__id", "product__name")
+    readonly_fields = ("created_at",)
+
+
 # =========================
 # PAYMENT
 # =========================
@@ -0,0 +1,64 @@
+from django.db.models import F, FloatField, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from apps.orders.models import Cart, CartItem
+
+
+# Totals are maintained from "lines": (quantity, unit price, unit weight).
+# A change passes the quantity difference, a full rewrite the quantities.
+
+def line_totals(lines):
+    """(item_count, subtotal, total_weight) of the lines."""
+    count = subtotal = weight = 0
+    for quantity, price, unit_weight in lines:
+        count += quantity
+        subtotal += quantity * price
+        weight += quantity * unit_weight
+    return count, subtotal, weight
+
+
+def adjust_cart(cart_id, lines):
+    """Add the lines' totals to the stored ones – a single UPDATE."""
+    count, subtotal, weight = line_totals(lines)
+    Cart.objects.filter(pk=cart_id).update(
+        item_count=F("item_count") + count,
+        subtotal=F("subtotal") + subtotal,
+        total_weight=F("total_weight") + weight,
+        version=F("version") + 1,
+    )
+
+
+def set_cart_totals(cart, lines):
+    """Replace the stored totals of a (locked) cart with the lines' totals."""
+    cart.item_count, cart.subtotal, cart.total_weight = line_totals(lines)
+    cart.version += 1
+    cart.save(update_fields=["item_count", "subtotal", "total_weight", "version"])
+
+
+def _items_sum(expression, output_field):
+    items = (
+        CartItem.objects.filter(cart=OuterRef("pk"))
+        .values("cart")
+        .annotate(total=Sum(expression, output_field=output_field))
+        .values("total")
+    )
+    return Coalesce(Subquery(items), 0, output_field=output_field)
+
+
+def refresh_cart_totals(carts):
+    """Recompute the stored totals of a Cart queryset from its items."""
+    return carts.update(
+        item_count=_items_sum(F("quantity"), IntegerField()),
+        subtotal=_items_sum(F("quantity") * F("product__price"), IntegerField()),
+        total_weight=_items_sum(F("quantity") * F("product__weight"), FloatField()),
+        version=F("version") + 1,
+    )
+
+
+def refresh_carts_for_products(product_ids):
+    """After a price / weight change: re-total the active carts holding them."""
+    carts = Cart.objects.filter(
+        is_active=True,
+        pk__in=CartItem.objects.filter(product_id__in=product_ids).values("cart_id"),
+    )
+    return refresh_cart_totals(carts)
@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.orders.models import StockHold
+from apps.products.inventory import movement, record_movements
+
+
+# How long a checkout keeps its units while the customer pays
+HOLD_TTL = timedelta(minutes=15)
+
+
+def active_holds():
+    return StockHold.objects.filter(status="active", expires_at__gt=timezone.now())
+
+
+def held_quantities(product_ids):
+    """{product_id: units held by live checkouts}, in one query."""
+    rows = (
+        active_holds()
+        .filter(product_id__in=product_ids)
+        .values("product_id")
+        .annotate(held=Sum("quantity"))
+    )
+    return {row["product_id"]: row["held"] for row in rows}
+
+
+def held_subquery(exclude_payment_order=None):
+    """Units held on the outer Product row, as an expression (0 if none)."""
+    holds = active_holds().filter(product=OuterRef("pk"))
+    if exclude_payment_order is not None:
+        holds = holds.exclude(payment_order=exclude_payment_order)
+
+    total = holds.values("product").annotate(held=Sum("quantity")).values("held")
+    return Coalesce(Subquery(total), 0)
+
+
+def place_holds(payment_order, quantities):
+    """quantities: {product_id: units}"""
+    expires_at = timezone.now() + HOLD_TTL
+    StockHold.objects.bulk_create([
+        StockHold(
+            payment_order=payment_order,
+            product_id=product_id,
+            quantity=quantity,
+            expires_at=expires_at,
+        )
+        for product_id, quantity in quantities.items()
+    ])
+
+    reference = f"payment_order:{payment_order.pk}"
+    record_movements(
+        movement(product_id, "hold", held_delta=quantity, reference=reference)
+        for product_id, quantity in quantities.items()
+    )
+
+
+def finish_holds(status, **filters):
+    """
+    Move active holds to `status`. Returns the finished rows as
+    (product_id, quantity, payment_order_id) tuples, which the ledger needs
+    – so they are locked and read before the UPDATE.
+    """
+    with transaction.atomic():
+        holds = list(
+            StockHold.objects.select_for_update()
+            .filter(status="active", **filters)
+            .order_by("pk")
+            .values_list("pk", "product_id", "quantity", "payment_order_id")
+        )
+        StockHold.objects.filter(pk__in=[h[0] for h in holds]).update(status=status)
+
+    return [h[1:] for h in holds]
+
+
+@transaction.atomic
+def release_holds(status="released", **filters):
+    holds = finish_holds(status, **filters)
+    record_movements(
+        movement(
+            product_id, "release", held_delta=-quantity,
+            reference=f"payment_order:{payment_order_id}",
+        )
+        for product_id, quantity, payment_order_id in holds
+    )
+    return len(holds)
+
+
+def convert_holds(payment_order):
+    """
+    {product_id: units} no longer held. The caller records them together
+    with the sale (see payments.deduct_stock).
+    """
+    converted = {}
+    for product_id, quantity, _ in finish_holds("converted", payment_order=payment_order):
+        converted[product_id] = converted.get(product_id, 0) + quantity
+    return converted
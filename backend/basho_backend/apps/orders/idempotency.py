@@ -0,0 +1,142 @@
+import hashlib
+from datetime import timedelta
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from apps.orders.models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+# How long a finished request is replayed to retries
+IDEMPOTENCY_TTL = timedelta(hours=24)
+
+# A claim whose request never finished (crashed worker) lapses after this
+CLAIM_TTL = timedelta(minutes=2)
+
+
+def request_hash(request):
+    return hashlib.sha256(request.method.encode() + b" " + request.body).hexdigest()
+
+
+def claim_key(key, endpoint, user, digest):
+    """(record, True) if this request owns the key, else (existing record, False)."""
+    now = timezone.now()
+
+    with transaction.atomic():
+        # Lapsed entries no longer count
+        IdempotencyKey.objects.filter(
+            key=key, endpoint=endpoint, expires_at__lte=now
+        ).delete()
+
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    key=key,
+                    endpoint=endpoint,
+                    user=user,
+                    request_hash=digest,
+                    expires_at=now + CLAIM_TTL,
+                )
+                return record, True
+        except IntegrityError:
+            return IdempotencyKey.objects.filter(key=key, endpoint=endpoint).first(), False
+
+
+def store_response(record, response):
+    if isinstance(response, Response):
+        # Not rendered yet – DRF does that after the view returns
+        body, content_type = JSONRenderer().render(response.data), "application/json"
+    elif not response.streaming:
+        body, content_type = response.content, response["Content-Type"]
+    else:
+        record.delete()
+        return
+
+    IdempotencyKey.objects.filter(pk=record.pk).update(
+        status_code=response.status_code,
+        content_type=content_type,
+        response_body=body,
+        expires_at=timezone.now() + IDEMPOTENCY_TTL,
+    )
+
+
+def replay(record, user, digest):
+    if record is None or record.status_code is None:
+        return JsonResponse(
+            {"error": "A request with this Idempotency-Key is still in progress"},
+            status=409
+        )
+
+    if record.request_hash != digest or record.user_id != getattr(user, "pk", None):
+        return JsonResponse(
+            {"error": "Idempotency-Key was already used for a different request"},
+            status=422
+        )
+
+    response = HttpResponse(
+        bytes(record.response_body),
+        status=record.status_code,
+        content_type=record.content_type,
+    )
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def retryable(response):
+    """
+    Mark a failure response as not final: @idempotent frees the key
+    instead of storing it, so a retry with the same key runs the view
+    again (for transient errors – DB hiccups, gateway timeouts – that a
+    catch-all turns into a 4xx).
+    """
+    response.idempotent_retryable = True
+    return response
+
+
+def idempotent(view):
+    """
+    Honour an Idempotency-Key header: the first request runs the view and
+    its response is stored; retries with the same key get that response
+    back without running the view again.
+
+    Goes *under* @api_view / on the APIView method, so request.user is
+    already authenticated. Server errors, exceptions and responses marked
+    retryable() are not stored – the key is freed and the client may
+    retry for real.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+
+        if len(key) > 255:
+            return JsonResponse({"error": "Idempotency-Key is too long"}, status=400)
+
+        user = request.user if request.user.is_authenticated else None
+        digest = request_hash(request)
+
+        record, claimed = claim_key(key, request.path, user, digest)
+        if not claimed:
+            return replay(record, user, digest)
+
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+
+        if response.status_code >= 500 or getattr(response, "idempotent_retryable", False):
+            record.delete()
+        else:
+            store_response(record, response)
+        return response
+
+    return wrapper
@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.orders.holds import release_holds
+from apps.orders.models import StockHold
+
+
+class Command(BaseCommand):
+    help = "Mark lapsed stock holds expired and delete old finished ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            default=7,
+            help="Days to keep converted / released / expired holds",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+
+        # Range scan on stockhold_active_expiry_idx; writes the ledger's
+        # "release" rows too
+        expired = release_holds(status="expired", expires_at__lte=now)
+
+        deleted, _ = StockHold.objects.exclude(status="active").filter(
+            created_at__lt=now - timedelta(days=options["keep_days"])
+        ).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {expired} holds, deleted {deleted} old holds"
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.orders.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses past their expiry"
+
+    def handle(self, *args, **options):
+        # Range scan on idempotency_expiry_idx
+        deleted, _ = IdempotencyKey.objects.filter(
+            expires_at__lte=timezone.now()
+        ).delete()
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency keys"))
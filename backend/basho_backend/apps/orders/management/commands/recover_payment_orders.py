@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.orders.holds import release_holds
+from apps.orders.models import Order, PaymentOrder
+
+
+class Command(BaseCommand):
+    help = (
+        "Fail PENDING payment orders that never got a Razorpay order "
+        "(gateway error or crash between the two checkout phases)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=30,
+            help="Minutes to wait before treating a payment order as abandoned",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options["older_than"])
+
+        with transaction.atomic():
+            # skip_locked: leave rows a checkout is still working on
+            ids = list(
+                PaymentOrder.objects.select_for_update(skip_locked=True)
+                .filter(
+                    status="PENDING",
+                    razorpay_order_id__isnull=True,
+                    created_at__lt=cutoff,
+                )
+                .values_list("id", flat=True)
+            )
+
+            if options["dry_run"]:
+                self.stdout.write(f"Would fail {len(ids)} payment orders: {ids}")
+                return
+
+            orders = Order.objects.filter(
+                payment_order_id__in=ids, status="created"
+            ).update(status="failed")
+            PaymentOrder.objects.filter(id__in=ids).update(status="FAILED")
+            release_holds(payment_order_id__in=ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Failed {len(ids)} abandoned payment orders ({orders} product orders)"
+        ))
@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-18 17:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def deactivate_duplicate_carts(apps, schema_editor):
+    """Keep each user's newest active cart; older duplicates go inactive."""
+    Cart = apps.get_model("orders", "Cart")
+    seen = set()
+    stale = []
+    for cart_id, user_id in (
+        Cart.objects.filter(is_active=True, user__isnull=False)
+        .order_by("user_id", "-created_at", "-id")
+        .values_list("id", "user_id")
+    ):
+        if user_id in seen:
+            stale.append(cart_id)
+        seen.add(user_id)
+    Cart.objects.filter(id__in=stale).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_idempotency_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(deactivate_duplicate_carts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cart',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('user',), name='cart_one_active_per_user'),
+        ),
+    ]
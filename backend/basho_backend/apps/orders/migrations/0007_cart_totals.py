@@ -0,0 +1,52 @@
+# Generated by Django 6.0 on 2026-10-18 17:16
+
+from django.db import migrations, models
+from django.db.models import F, FloatField, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_cart_totals(apps, schema_editor):
+    Cart = apps.get_model("orders", "Cart")
+    CartItem = apps.get_model("orders", "CartItem")
+
+    def items_sum(expression, output_field):
+        items = (
+            CartItem.objects.filter(cart=OuterRef("pk"))
+            .values("cart")
+            .annotate(total=Sum(expression, output_field=output_field))
+            .values("total")
+        )
+        return Coalesce(Subquery(items), 0, output_field=output_field)
+
+    Cart.objects.update(
+        item_count=items_sum(F("quantity"), IntegerField()),
+        subtotal=items_sum(F("quantity") * F("product__price"), IntegerField()),
+        total_weight=items_sum(F("quantity") * F("product__weight"), FloatField()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_cart_one_active_per_user'),
+        ('products', '0012_inventory_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='subtotal',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total_weight',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(backfill_cart_totals, migrations.RunPython.noop),
+    ]
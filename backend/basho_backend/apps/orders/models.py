@@ -10,15 +10,35 @@ from django.core.validators import FileExtensionValidator
 # =========================
 
 class Cart(models.Model):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Empty for anonymous carts, which are tracked through the session
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
     is_active = models.BooleanField(default=True)
+
+    # Stored totals, kept in step with the items by every cart change and
+    # by product price / weight changes (see cart_totals.py)
+    item_count = models.PositiveIntegerField(default=0)
+    subtotal = models.PositiveIntegerField(default=0)
+    total_weight = models.FloatField(default=0)
+    version = models.PositiveIntegerField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
-    def total_weight(self):
-        return sum(item.product.weight * item.quantity for item in self.items.all())
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user"],
+                condition=models.Q(is_active=True),
+                name="cart_one_active_per_user",
+            ),
+        ]
 
     def total_price(self):
-        return sum(item.product.price * item.quantity for item in self.items.all())
+        return self.subtotal
 
     def __str__(self):
         return f"Cart {self.id} - {self.user}"
@@ -127,6 +147,104 @@ class OrderItem(models.Model):
         return f"{self.product_name} ({self.quantity})"
 
 
+# =========================
+# STOCK HOLDS
+# =========================
+
+class StockHold(models.Model):
+    """
+    Stock reserved for a pending product checkout until `expires_at`.
+    Available stock = Product.stock - active, unexpired holds.
+    """
+
+    STATUS = (
+        ("active", "Active"),
+        ("converted", "Converted"),  # paid – Product.stock was reduced
+        ("released", "Released"),  # checkout abandoned or payment failed
+        ("expired", "Expired"),
+    )
+
+    payment_order = models.ForeignKey(
+        PaymentOrder,
+        on_delete=models.CASCADE,
+        related_name="stock_holds"
+    )
+    product = models.ForeignKey(
+        "products.Product",
+        on_delete=models.CASCADE,
+        related_name="stock_holds"
+    )
+    quantity = models.PositiveIntegerField()
+
+    status = models.CharField(max_length=20, choices=STATUS, default="active")
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Partial indexes: only live holds are ever searched, so both stay
+        # small no matter how much history accumulates
+        indexes = [
+            # Held quantity per product (checkout / availability)
+            models.Index(
+                fields=["product", "expires_at"],
+                condition=models.Q(status="active"),
+                name="stockhold_active_product_idx",
+            ),
+            # Expiry sweep
+            models.Index(
+                fields=["expires_at"],
+                condition=models.Q(status="active"),
+                name="stockhold_active_expiry_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Hold {self.quantity} x {self.product_id} ({self.status})"
+
+
+# =========================
+# IDEMPOTENCY KEYS
+# =========================
+
+class IdempotencyKey(models.Model):
+    """
+    Stored response for a request sent with an Idempotency-Key header,
+    replayed to retries until `expires_at` (see idempotency.py).
+    """
+
+    key = models.CharField(max_length=255)
+    endpoint = models.CharField(max_length=200)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    request_hash = models.CharField(max_length=64)
+
+    # Empty while the first request is still running
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    response_body = models.BinaryField(default=b"")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["key", "endpoint"], name="idempotency_key_unique"
+            ),
+        ]
+        indexes = [
+            # Purge sweep
+            models.Index(fields=["expires_at"], name="idempotency_expiry_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.endpoint} {self.key} ({self.status_code or 'running'})"
+
+
 # =========================
 # PAYMENT & TRANSACTIONS
 # =========================
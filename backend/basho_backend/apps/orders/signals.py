@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from apps.products.models import Product
+from apps.products.signals import is_volatile_save
+
+from .cart_totals import refresh_cart_totals, refresh_carts_for_products
+from .models import Cart, CartItem
+
+
+# =========================
+# CART TOTALS
+# =========================
+
+@receiver(post_save, sender=Product)
+def retotal_carts_on_price_change(sender, instance, created=False, update_fields=None, **kwargs):
+    # Stock-only saves can't change a price
+    if created or is_volatile_save(update_fields):
+        return
+    refresh_carts_for_products([instance.pk])
+
+
+@receiver(pre_delete, sender=Product)
+def remember_carts(sender, instance, **kwargs):
+    # The cascade removes the items, so find their carts beforehand
+    instance._cart_ids = list(
+        CartItem.objects.filter(product=instance).values_list("cart_id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Product)
+def retotal_carts_on_delete(sender, instance, **kwargs):
+    cart_ids = getattr(instance, "_cart_ids", None)
+    if cart_ids:
+        refresh_cart_totals(Cart.objects.filter(pk__in=cart_ids))
@@ -1,3 +1,632 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.orders.cart_totals import refresh_cart_totals
+from apps.orders.holds import held_quantities, place_holds
+from apps.orders.models import (
+    Cart, CartItem, IdempotencyKey, Order, OrderItem, PaymentOrder, StockHold,
+)
+from apps.orders.views.payments import deduct_stock
+from apps.products.cache import get_catalog_version
+from apps.products.models import Category, Product
+
+
+CUSTOMER = {
+    "fullName": "Asha",
+    "email": "asha@example.com",
+    "phone": "9999999999",
+    "address": "12 Potter Lane",
+    "city": "Pune",
+    "pincode": "411001",
+}
+
+
+def make_user(username="asha"):
+    return get_user_model().objects.create(username=username, email=f"{username}@example.com")
+
+
+def make_products(count, stock=5):
+    category, _ = Category.objects.get_or_create(name="Tableware", slug="tableware")
+    return [
+        Product.objects.create(
+            id=f"mug-{i}",
+            category=category,
+            name=f"Tea Mug {i}",
+            description="Stoneware mug",
+            price=100 + i * 10,
+            stock=stock,
+            weight=0.5,
+            images=[f"/media/mug-{i}.jpg"],
+        )
+        for i in range(count)
+    ]
+
+
+def make_cart(user, products, quantity=1):
+    """Active cart holding `quantity` of each product, totals included."""
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.bulk_create([
+        CartItem(cart=cart, product=product, quantity=quantity) for product in products
+    ])
+    refresh_cart_totals(Cart.objects.filter(pk=cart.pk))
+    return cart
+
+
+def api_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def make_payment_order(user, lines):
+    """PENDING payment order + product order for [(product, quantity)]."""
+    payment_order = PaymentOrder.objects.create(
+        user=user, order_type="PRODUCT", amount=100, status="PENDING"
+    )
+    order = Order.objects.create(
+        payment_order=payment_order,
+        full_name="Asha", email="asha@example.com", phone="1",
+        address="x", city="Pune", pincode="1",
+        subtotal=0, shipping_cost=50, total_weight=0, total_amount=100,
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order, product=product, product_name=product.name,
+            price=product.price, quantity=quantity, weight_kg=product.weight,
+        )
+        for product, quantity in lines
+    ])
+    payment_order.linked_object_id = order.id
+    payment_order.linked_app = "orders"
+    payment_order.save()
+    return payment_order
+
+
+# =========================
+# STOCK DEDUCTION
+# =========================
+
+class DeductStockTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+
+    def test_deducts_without_moving_the_catalog_version(self):
+        product, = make_products(1, stock=5)
+        payment_order = make_payment_order(self.user, [(product, 2)])
+        before = get_catalog_version()
+
+        deduct_stock(payment_order, payment_order.product_order.items.all())
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 3)
+        self.assertEqual(get_catalog_version(), before)
+
+    def test_shortage_deducts_nothing(self):
+        plenty, short = make_products(2, stock=2)
+        short.stock = 1
+        short.save()
+        payment_order = make_payment_order(self.user, [(plenty, 2), (short, 2)])
+
+        with self.assertRaisesMessage(Exception, "Tea Mug 1 stock insufficient"):
+            with transaction.atomic():
+                deduct_stock(payment_order, payment_order.product_order.items.all())
+
+        self.assertEqual(
+            dict(Product.objects.values_list("id", "stock")),
+            {"mug-0": 2, "mug-1": 1},
+        )
+
+    def test_repeated_lines_are_deducted_together(self):
+        product, = make_products(1, stock=3)
+        payment_order = make_payment_order(self.user, [(product, 2), (product, 2)])
+
+        with self.assertRaises(Exception):
+            deduct_stock(payment_order, payment_order.product_order.items.all())
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 3)
+
+
+# =========================
+# GUEST CARTS
+# =========================
+
+class LazyGuestCartTests(TestCase):
+    def setUp(self):
+        make_products(1)
+        self.client = APIClient()
+
+    def test_opening_the_cart_creates_nothing(self):
+        response = self.client.get("/api/orders/cart/")
+
+        self.assertEqual(response.json()["items"], [])
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(Session.objects.exists())
+
+    def test_first_add_materializes_the_cart(self):
+        self.client.get("/api/orders/cart/")
+        self.client.post("/api/orders/cart/add/", {"product_id": "mug-0"}, format="json")
+        self.client.post("/api/orders/cart/add/", {"product_id": "mug-0"}, format="json")
+
+        cart = Cart.objects.get()
+        self.assertIsNone(cart.user)
+        self.assertEqual(cart.items.get().quantity, 2)
+        self.assertEqual(Session.objects.get().get_decoded()["cart_id"], cart.id)
+        self.assertEqual(self.client.get("/api/orders/cart/").json()["cart_id"], cart.id)
+
+    def test_second_active_cart_for_a_user_is_rejected(self):
+        user = make_user()
+        Cart.objects.create(user=user)
+
+        with self.assertRaises(IntegrityError):
+            Cart.objects.create(user=user)
+
+
+# =========================
+# CART SYNC
+# =========================
+
+class MergeGuestCartTests(TestCase):
+    def setUp(self):
+        self.products = make_products(2)
+        self.client = APIClient()
+        self.client.post("/api/orders/cart/add/", {"product_id": "mug-0", "quantity": 2}, format="json")
+        self.guest = Cart.objects.get(user=None)
+        self.user = make_user()
+        self.client.force_authenticate(self.user)
+
+    def merge(self, items):
+        return self.client.post("/api/orders/cart/sync/", {"mode": "merge", "items": items}, format="json")
+
+    def test_merge_takes_the_guest_cart(self):
+        self.merge([{"product_id": "mug-1", "quantity": 1}])
+
+        cart = Cart.objects.get(user=self.user, is_active=True)
+        self.assertEqual(
+            dict(cart.items.values_list("product_id", "quantity")),
+            {"mug-0": 2, "mug-1": 1},
+        )
+        self.assertEqual((cart.item_count, cart.subtotal), (3, 2 * 100 + 110))
+        self.guest.refresh_from_db()
+        self.assertFalse(self.guest.is_active)
+
+    def test_failed_merge_keeps_the_guest_cart(self):
+        with mock.patch(
+            "apps.orders.views.cart.set_cart_totals", side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            self.merge([{"product_id": "mug-1", "quantity": 1}])
+
+        self.guest.refresh_from_db()
+        self.assertTrue(self.guest.is_active)
+        self.assertEqual(self.guest.items.get().quantity, 2)
+
+
+# =========================
+# CART TOTALS
+# =========================
+
+class CartTotalsTests(TestCase):
+    def setUp(self):
+        self.products = make_products(2)
+        self.user = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, path, data):
+        return self.client.post(f"/api/orders/cart/{path}/", data, format="json")
+
+    def totals(self):
+        cart = Cart.objects.get(user=self.user, is_active=True)
+        return cart.item_count, cart.subtotal, round(cart.total_weight, 3)
+
+    def test_add_update_remove_keep_totals(self):
+        self.post("add", {"product_id": "mug-0", "quantity": 2})
+        self.post("add", {"product_id": "mug-1", "quantity": 1})
+        self.assertEqual(self.totals(), (3, 2 * 100 + 110, 1.5))
+
+        item = CartItem.objects.get(product_id="mug-0")
+        self.post("update", {"item_id": item.id, "quantity": 4})
+        self.assertEqual(self.totals(), (5, 4 * 100 + 110, 2.5))
+
+        self.post("remove", {"item_id": item.id})
+        self.assertEqual(self.totals(), (1, 110, 0.5))
+
+    def test_add_clamps_to_stock(self):
+        self.post("add", {"product_id": "mug-0", "quantity": 9})
+        self.assertEqual(self.totals(), (5, 5 * 100, 2.5))
+
+    def test_second_remove_does_not_subtract_again(self):
+        self.post("add", {"product_id": "mug-0", "quantity": 2})
+        item = CartItem.objects.get()
+
+        self.post("remove", {"item_id": item.id})
+        self.post("remove", {"item_id": item.id})
+
+        self.assertEqual(self.totals(), (0, 0, 0))
+
+    def test_items_of_another_cart_are_not_touched(self):
+        other = APIClient()
+        other.force_authenticate(make_user("ravi"))
+        other.post("/api/orders/cart/add/", {"product_id": "mug-0", "quantity": 2}, format="json")
+        item = CartItem.objects.get()
+
+        response = self.post("update", {"item_id": item.id, "quantity": 1})
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+
+class GetCartQueryCountTests(TestCase):
+    def test_query_count_does_not_grow_with_the_cart(self):
+        products = make_products(10)
+        asha, ravi = make_user("asha"), make_user("ravi")
+        make_cart(asha, products[:1])
+        make_cart(ravi, products)
+        one_item, ten_items = api_client(asha), api_client(ravi)
+
+        with CaptureQueriesContext(connection) as queries:
+            one_item.get("/api/orders/cart/")
+        with self.assertNumQueries(len(queries.captured_queries)):
+            response = ten_items.get("/api/orders/cart/")
+
+        self.assertEqual(len(response.json()["items"]), 10)
+        self.assertEqual(response.json()["total_price"], sum(p.price for p in products))
+
+
+class BatchCartTests(TestCase):
+    def setUp(self):
+        self.products = make_products(6)
+        self.user = make_user()
+        self.cart = make_cart(self.user, self.products[:2])
+        self.client = api_client(self.user)
+
+    def batch(self, operations):
+        return self.client.post("/api/orders/cart/batch/", {"operations": operations}, format="json")
+
+    def test_operations_apply_in_order(self):
+        item = self.cart.items.get(product_id="mug-0")
+
+        response = self.batch([
+            {"op": "add", "product_id": "mug-2", "quantity": 2},
+            {"op": "update", "item_id": item.id, "quantity": 3},
+            {"op": "remove", "product_id": "mug-1"},
+            {"op": "add", "product_id": "mug-2", "quantity": 9},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            dict(self.cart.items.values_list("product_id", "quantity")),
+            {"mug-0": 3, "mug-2": 5},
+        )
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.item_count, self.cart.subtotal), (8, 3 * 100 + 5 * 120))
+        self.assertEqual(response.json()["total_price"], self.cart.subtotal)
+
+    def test_bad_operation_changes_nothing(self):
+        response = self.batch([
+            {"op": "add", "product_id": "mug-2"},
+            {"op": "add", "product_id": "nope"},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "operation 1: unknown product nope")
+        self.assertEqual(self.cart.items.count(), 2)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.batch([{"op": "add", "product_id": "mug-2"}])
+        with self.assertNumQueries(len(queries.captured_queries)):
+            self.batch([{"op": "add", "product_id": p.id} for p in self.products[3:]])
+
+    def test_anonymous_batch_without_adds_creates_no_cart(self):
+        response = APIClient().post(
+            "/api/orders/cart/batch/",
+            {"operations": [{"op": "remove", "product_id": "mug-0"}]},
+            format="json",
+        )
+
+        self.assertEqual(response.json()["cart_id"], None)
+        self.assertEqual(Cart.objects.count(), 1)
+
+
+# =========================
+# CHECKOUT
+# =========================
+
+@mock.patch("apps.orders.views.checkout.client")
+class CheckoutQueryCountTests(TestCase):
+    def setUp(self):
+        self.products = make_products(10)
+
+    def client_with_cart(self, username, item_count):
+        user = make_user(username)
+        make_cart(user, self.products[:item_count])
+        return api_client(user)
+
+    def checkout(self, client):
+        response = client.post("/api/orders/checkout/product/", {"customer": CUSTOMER}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_query_count_does_not_grow_with_the_cart(self, razorpay):
+        razorpay.order.create.return_value = {"id": "order_x"}
+        one_item = self.client_with_cart("asha", 1)
+        ten_items = self.client_with_cart("ravi", 10)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.checkout(one_item)
+        with self.assertNumQueries(len(queries.captured_queries)):
+            self.checkout(ten_items)
+
+        self.assertEqual(OrderItem.objects.count(), 11)
+
+
+class CheckoutQuoteTests(TestCase):
+    def setUp(self):
+        self.products = make_products(2)
+        self.user = make_user()
+        self.cart = make_cart(self.user, self.products, quantity=2)
+        self.client = api_client(self.user)
+
+    def quote(self, etag=""):
+        return self.client.get("/api/orders/checkout/quote/", HTTP_IF_NONE_MATCH=etag)
+
+    def test_quote_totals_without_placing_an_order(self):
+        response = self.quote()
+
+        # 2 x 100 + 2 x 110, shipping 50, GST 18% on both
+        self.assertEqual(response.json(), {
+            "item_count": 4,
+            "total_weight": 2.0,
+            "subtotal": 420,
+            "shipping_cost": 50,
+            "gst": 84.6,
+            "total_amount": 554.6,
+        })
+        self.assertFalse(PaymentOrder.objects.exists())
+        self.assertFalse(Order.objects.exists())
+
+    def test_empty_cart_has_no_quote(self):
+        self.client.post("/api/orders/cart/clear/")
+
+        self.assertEqual(self.quote().status_code, 400)
+
+    def test_etag_follows_the_cart_version(self):
+        etag = self.quote()["ETag"]
+        self.assertEqual(self.quote(etag).status_code, 304)
+
+        self.client.post("/api/orders/cart/add/", {"product_id": "mug-0"}, format="json")
+        response = self.quote(etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["subtotal"], 520)
+
+    def test_price_change_moves_the_etag(self):
+        etag = self.quote()["ETag"]
+
+        product = self.products[0]
+        product.price = 150
+        product.save()
+        response = self.quote(etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["subtotal"], 2 * 150 + 2 * 110)
+
+
+# =========================
+# STOCK HOLDS
+# =========================
+
+@mock.patch("apps.orders.views.checkout.client")
+class StockHoldTests(TestCase):
+    def setUp(self):
+        self.product, = make_products(1, stock=2)
+        self.asha, self.ravi = make_user("asha"), make_user("ravi")
+        make_cart(self.asha, [self.product], quantity=2)
+        make_cart(self.ravi, [self.product], quantity=1)
+
+    def checkout(self, user):
+        return api_client(user).post("/api/orders/checkout/product/", {"customer": CUSTOMER}, format="json")
+
+    def test_held_units_are_not_sold_twice(self, razorpay):
+        razorpay.order.create.return_value = {"id": "order_x"}
+        self.assertEqual(self.checkout(self.asha).status_code, 200)
+
+        response = self.checkout(self.ravi)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "Tea Mug 0 is out of stock")
+
+    def test_expired_holds_free_their_units(self, razorpay):
+        razorpay.order.create.return_value = {"id": "order_x"}
+        self.checkout(self.asha)
+        StockHold.objects.update(expires_at=timezone.now())
+
+        call_command("expire_stock_holds", stdout=io.StringIO())
+
+        self.assertEqual(StockHold.objects.get(payment_order__user=self.asha).status, "expired")
+        self.assertEqual(self.checkout(self.ravi).status_code, 200)
+
+    def test_lapsed_hold_is_not_counted_before_the_sweep(self, razorpay):
+        razorpay.order.create.return_value = {"id": "order_x"}
+        self.checkout(self.asha)
+        self.assertEqual(held_quantities([self.product.id]), {self.product.id: 2})
+
+        StockHold.objects.update(expires_at=timezone.now())
+
+        self.assertEqual(StockHold.objects.get().status, "active")
+        self.assertEqual(held_quantities([self.product.id]), {})
+        self.assertEqual(self.checkout(self.ravi).status_code, 200)
+
+    def test_new_checkout_releases_the_earlier_one(self, razorpay):
+        razorpay.order.create.return_value = {"id": "order_x"}
+        self.checkout(self.asha)
+        self.checkout(self.asha)
+
+        self.assertEqual(
+            sorted(StockHold.objects.values_list("status", flat=True)),
+            ["active", "released"],
+        )
+
+    def test_gateway_failure_releases_the_hold(self, razorpay):
+        razorpay.order.create.side_effect = RuntimeError("timeout")
+
+        self.assertEqual(self.checkout(self.asha).status_code, 502)
+        self.assertEqual(StockHold.objects.get().status, "released")
+
+    def test_deduction_skips_own_hold_but_not_others(self, razorpay):
+        razorpay.order.create.return_value = {"id": "order_x"}
+        self.checkout(self.ravi)
+        mine = make_payment_order(self.asha, [(self.product, 1)])
+        place_holds(mine, {self.product.id: 1})
+
+        deduct_stock(mine, mine.product_order.items.all())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 1)
+
+        # Ravi still holds the last unit
+        other = make_payment_order(self.asha, [(self.product, 1)])
+        with self.assertRaises(Exception):
+            deduct_stock(other, other.product_order.items.all())
+
+
+# =========================
+# IDEMPOTENCY KEYS
+# =========================
+
+@mock.patch("apps.orders.views.checkout.client")
+class IdempotentCheckoutTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        make_cart(self.user, make_products(1))
+        self.client = api_client(self.user)
+
+    def checkout(self, key, customer=CUSTOMER):
+        return self.client.post(
+            "/api/orders/checkout/product/", {"customer": customer},
+            format="json", HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_the_first_response(self, razorpay):
+        razorpay.order.create.return_value = {"id": "order_x"}
+        first = self.checkout("key-1")
+
+        retry = self.checkout("key-1")
+
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(PaymentOrder.objects.count(), 1)
+        razorpay.order.create.assert_called_once()
+
+    def test_reused_key_with_another_body_is_rejected(self, razorpay):
+        razorpay.order.create.return_value = {"id": "order_x"}
+        self.checkout("key-1")
+
+        response = self.checkout("key-1", {**CUSTOMER, "city": "Mumbai"})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(PaymentOrder.objects.count(), 1)
+
+    def test_reused_key_of_another_user_is_rejected(self, razorpay):
+        razorpay.order.create.return_value = {"id": "order_x"}
+        self.checkout("key-1")
+
+        self.client = api_client(make_user("ravi"))
+        response = self.checkout("key-1")
+
+        self.assertEqual(response.status_code, 422)
+
+    def test_key_in_progress_is_a_conflict(self, razorpay):
+        IdempotencyKey.objects.create(
+            key="key-1", endpoint="/api/orders/checkout/product/", user=self.user,
+            request_hash="", expires_at=timezone.now() + timedelta(minutes=2),
+        )
+
+        response = self.checkout("key-1")
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(PaymentOrder.objects.exists())
+
+    def test_server_error_frees_the_key(self, razorpay):
+        razorpay.order.create.side_effect = RuntimeError("timeout")
+        self.assertEqual(self.checkout("key-1").status_code, 502)
+
+        razorpay.order.create.side_effect = None
+        razorpay.order.create.return_value = {"id": "order_x"}
+        response = self.checkout("key-1")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+
+
+# =========================
+# PAYMENT VERIFICATION
+# =========================
+
+@mock.patch("apps.orders.views.payments.send_product_email")
+@mock.patch("apps.orders.views.payments.client")
+@mock.patch("apps.orders.views.checkout.client")
+class VerifyPaymentTests(TransactionTestCase):
+    # Not TestCase: verify_payment runs outside any transaction in
+    # production, and a test-wide atomic() would hide that
+
+    def test_paid_order_clears_the_cart(self, checkout_razorpay, razorpay, send_email):
+        checkout_razorpay.order.create.return_value = {"id": "order_x"}
+        user = make_user()
+        make_cart(user, make_products(2), quantity=2)
+        client = api_client(user)
+        client.post("/api/orders/checkout/product/", {"customer": CUSTOMER}, format="json")
+
+        response = client.post("/api/orders/payment/verify/", {
+            "razorpay_order_id": "order_x",
+            "razorpay_payment_id": "pay_x",
+            "razorpay_signature": "sig",
+        }, format="json")
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(PaymentOrder.objects.get().status, "PAID")
+        self.assertEqual(Order.objects.get().status, "paid")
+        self.assertEqual(StockHold.objects.get(product_id="mug-0").status, "converted")
+        self.assertEqual(Product.objects.get(id="mug-0").stock, 3)
+
+        cart = Cart.objects.get(user=user)
+        self.assertFalse(cart.is_active)
+        self.assertFalse(cart.items.exists())
+        self.assertEqual((cart.item_count, cart.subtotal, cart.total_weight), (0, 0, 0))
+
+    def test_failed_verification_is_not_replayed(self, checkout_razorpay, razorpay, send_email):
+        checkout_razorpay.order.create.return_value = {"id": "order_x"}
+        user = make_user()
+        make_cart(user, make_products(1))
+        client = api_client(user)
+        client.post("/api/orders/checkout/product/", {"customer": CUSTOMER}, format="json")
+
+        def verify():
+            return client.post("/api/orders/payment/verify/", {
+                "razorpay_order_id": "order_x",
+                "razorpay_payment_id": "pay_x",
+                "razorpay_signature": "sig",
+            }, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+
+        razorpay.utility.verify_payment_signature.side_effect = TimeoutError("gateway")
+        self.assertEqual(verify().status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        razorpay.utility.verify_payment_signature.side_effect = None
+        response = verify()
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+        self.assertEqual(PaymentOrder.objects.get().status, "PAID")
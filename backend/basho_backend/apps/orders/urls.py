@@ -1,6 +1,6 @@
 from django.urls import path
-from apps.orders.views.cart import add_to_cart, get_cart, remove_from_cart,clear_cart,update_cart,sync_cart
-from apps.orders.views.checkout import create_product_order,my_orders
+from apps.orders.views.cart import add_to_cart, batch_cart, get_cart, remove_from_cart,clear_cart,update_cart,sync_cart
+from apps.orders.views.checkout import checkout_quote, create_product_order,my_orders
 from apps.orders.views.payments import verify_payment
 urlpatterns = [
     path("cart/", get_cart),
@@ -8,8 +8,10 @@ urlpatterns = [
     path("cart/update/", update_cart),
     path("cart/remove/", remove_from_cart),
     path("cart/clear/", clear_cart),
+    path("cart/batch/", batch_cart),
     path("cart/remove/<int:item_id>/", remove_from_cart),
     path("checkout/product/", create_product_order),
+    path("checkout/quote/", checkout_quote),
     path("payment/verify/", verify_payment),
     path("my-orders/",my_orders ),
     path("cart/sync/", sync_cart), 
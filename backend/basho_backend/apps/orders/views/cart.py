@@ -1,11 +1,14 @@
 import json
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.db import transaction
+from django.db.models.fields.json import KeyTextTransform
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from apps.orders.cart_totals import adjust_cart, set_cart_totals
 from apps.orders.models import Cart, CartItem
 from apps.products.models import Product
 
@@ -14,50 +17,84 @@ from apps.products.models import Product
 # HELPERS
 # ------------------------
 
-def get_or_create_cart(request):
+def get_active_cart(user):
+    """
+    The user's active cart, created on first use. The only place a user
+    cart is created: cart_one_active_per_user guarantees there is at most
+    one, and ON CONFLICT DO NOTHING absorbs a concurrent creation.
+    """
+    cart = Cart.objects.filter(user=user, is_active=True).first()
+    if cart is None:
+        Cart.objects.bulk_create([Cart(user=user)], ignore_conflicts=True)
+        cart = Cart.objects.get(user=user, is_active=True)
+    return cart
+
+
+def get_or_create_cart(request, create=True):
+    """
+    Anonymous carts are not created or put in the session until something is
+    added; with create=False a visitor without one gets None – no row, no
+    session write.
+    """
     if request.user.is_authenticated:
-        cart, _ = Cart.objects.get_or_create(user=request.user, is_active=True)
-        return cart
+        return get_active_cart(request.user)
 
     cart_id = request.session.get("cart_id")
     if cart_id:
-        try:
-            return Cart.objects.get(id=cart_id, is_active=True)
-        except Cart.DoesNotExist:
-            pass
+        cart = Cart.objects.filter(id=cart_id, user=None, is_active=True).first()
+        if cart is not None:
+            return cart
+
+    if not create:
+        return None
 
     cart = Cart.objects.create(is_active=True)
     request.session["cart_id"] = cart.id
     return cart
 
 
-# ------------------------
-# GET CART
-# ------------------------
+def cart_summary(cart):
+    """
+    Items from one joined query; the totals are the cart's stored ones.
+    """
+    if cart is None:
+        return {"cart_id": None, "items": [], "total_price": 0, "total_weight": 0}
+
+    rows = (
+        cart.items.order_by("id")
+        .annotate(first_image=KeyTextTransform("0", "product__images"))
+        .values(
+            "id", "product_id", "product__name", "product__price",
+            "product__stock", "first_image", "quantity",
+        )
+    )
+
+    items = [
+        {
+            "id": row["id"],
+            "product_id": row["product_id"],
+            "name": row["product__name"],
+            "price": float(row["product__price"]),
+            "stock": row["product__stock"],
+            "image": row["first_image"] or "",
+            "quantity": row["quantity"],
+        }
+        for row in rows
+    ]
+
+    return {
+        "cart_id": cart.id,
+        "items": items,
+        "total_price": cart.subtotal,
+        "total_weight": round(cart.total_weight, 3),
+    }
+
 
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def get_cart(request):
-    cart = get_or_create_cart(request)
-
-    items = []
-    for item in cart.items.select_related("product"):
-        items.append({
-            "id": item.id,
-            "product_id": item.product.id,
-            "name": item.product.name,
-            "price": float(item.product.price),
-            "stock": item.product.stock,
-            "image": item.product.image.url if item.product.image else "",
-            "quantity": item.quantity
-        })
-
-    return Response({
-        "cart_id": cart.id,
-        "items": items,
-        "total_price": cart.total_price(),
-        "total_weight": cart.total_weight()
-    })
+    cart = get_or_create_cart(request, create=False)
+    return Response(cart_summary(cart))
 
 
 # ------------------------
@@ -73,11 +110,18 @@ def add_to_cart(request):
     qty = int(data.get("quantity", 1))
 
     product = Product.objects.get(id=product_id)
-    cart = get_or_create_cart(request)
 
-    item, _ = CartItem.objects.get_or_create(cart=cart, product=product)
-    item.quantity = min(item.quantity + qty, product.stock)
-    item.save()
+    with transaction.atomic():
+        # 🔐 LOCK CART – concurrent changes adjust the totals one at a time
+        cart = Cart.objects.select_for_update().get(pk=get_or_create_cart(request).pk)
+
+        item, _ = CartItem.objects.get_or_create(
+            cart=cart, product=product, defaults={"quantity": 0}
+        )
+        old_qty = item.quantity
+        item.quantity = min(item.quantity + qty, product.stock)
+        item.save()
+        adjust_cart(cart.id, [(item.quantity - old_qty, product.price, product.weight)])
 
     return Response({"message": "Item added"})
 
@@ -94,13 +138,26 @@ def update_cart(request):
     item_id = data.get("item_id")
     qty = int(data.get("quantity", 1))
 
-    item = CartItem.objects.get(id=item_id)
-
-    if qty <= 0:
-        item.delete()
-    else:
-        item.quantity = min(qty, item.product.stock)
-        item.save()
+    cart = get_or_create_cart(request, create=False)
+    if cart is None:
+        return Response({"message": "Item not found"}, status=404)
+
+    with transaction.atomic():
+        # 🔐 LOCK CART before reading the item
+        cart = Cart.objects.select_for_update().get(pk=cart.pk)
+        item = cart.items.select_related("product").filter(id=item_id).first()
+        if item is None:
+            return Response({"message": "Item not found"}, status=404)
+        product = item.product
+        old_qty = item.quantity
+
+        if qty <= 0:
+            item.delete()
+            item.quantity = 0
+        else:
+            item.quantity = min(qty, product.stock)
+            item.save()
+        adjust_cart(cart.id, [(item.quantity - old_qty, product.price, product.weight)])
 
     return Response({"message": "Cart updated"})
 
@@ -116,7 +173,19 @@ def remove_from_cart(request):
     data = json.loads(request.body or "{}")
     item_id = data.get("item_id")
 
-    CartItem.objects.filter(id=item_id).delete()
+    cart = get_or_create_cart(request, create=False)
+    if cart is None:
+        return Response({"message": "Item removed"})
+
+    with transaction.atomic():
+        # 🔐 LOCK CART before reading the item
+        cart = Cart.objects.select_for_update().get(pk=cart.pk)
+        item = cart.items.select_related("product").filter(id=item_id).first()
+        if item is not None:
+            deleted, _ = CartItem.objects.filter(id=item.id).delete()
+            # Only the request that removed the row takes it off the totals
+            if deleted:
+                adjust_cart(cart.id, [(-item.quantity, item.product.price, item.product.weight)])
     return Response({"message": "Item removed"})
 
 
@@ -128,10 +197,173 @@ def remove_from_cart(request):
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def clear_cart(request):
-    cart = get_or_create_cart(request)
-    cart.items.all().delete()
+    cart = get_or_create_cart(request, create=False)
+    if cart is not None:
+        with transaction.atomic():
+            cart = Cart.objects.select_for_update().get(pk=cart.pk)
+            cart.items.all().delete()
+            set_cart_totals(cart, [])
     return Response({"message": "Cart cleared"})
 
+# ------------------------
+# BATCH CHANGES
+# ------------------------
+
+BATCH_OPS = ("add", "update", "remove")
+MAX_BATCH_OPS = 100
+
+
+class BatchError(ValueError):
+    pass
+
+
+def apply_cart_ops(operations, quantities, item_products, stock):
+    """
+    Run the operations, in order, against {product_id: quantity}.
+    Items are addressed by item_id (existing rows) or product_id.
+    """
+    for index, op in enumerate(operations):
+        if not isinstance(op, dict) or op.get("op") not in BATCH_OPS:
+            raise BatchError(f"operation {index}: op must be one of {', '.join(BATCH_OPS)}")
+
+        try:
+            if op.get("item_id") is not None:
+                product_id = item_products[int(op["item_id"])]
+            else:
+                product_id = str(op["product_id"])
+            qty = int(op.get("quantity", 1))
+        except (KeyError, TypeError, ValueError):
+            raise BatchError(f"operation {index}: unknown item or product")
+
+        if product_id not in stock:
+            raise BatchError(f"operation {index}: unknown product {product_id}")
+
+        if op["op"] == "add":
+            qty += quantities.get(product_id, 0)
+        elif op["op"] == "remove":
+            qty = 0
+
+        quantities[product_id] = max(0, min(qty, stock[product_id]))
+
+
+@csrf_exempt
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def batch_cart(request):
+    """
+    Apply several cart changes in one request and return the new cart.
+    Payload example:
+    {
+        "operations": [
+            {"op": "add", "product_id": "mug-1", "quantity": 2},
+            {"op": "update", "item_id": 7, "quantity": 3},
+            {"op": "remove", "product_id": "bowl-4"}
+        ]
+    }
+    Query count does not depend on the number of operations.
+    """
+    operations = request.data.get("operations")
+    if not isinstance(operations, list) or not operations:
+        return Response({"message": "operations must be a non-empty list"}, status=400)
+    if len(operations) > MAX_BATCH_OPS:
+        return Response({"message": f"At most {MAX_BATCH_OPS} operations per batch"}, status=400)
+
+    creates = any(isinstance(op, dict) and op.get("op") == "add" for op in operations)
+
+    with transaction.atomic():
+        cart = get_or_create_cart(request, create=creates)
+        if cart is None:
+            return Response(cart_summary(None))
+
+        # 🔐 LOCK CART – overlapping batches apply one after the other
+        cart = Cart.objects.select_for_update().get(pk=cart.pk)
+
+        items = {item.product_id: item for item in cart.items.all()}
+        item_products = {item.id: product_id for product_id, item in items.items()}
+        quantities = {product_id: item.quantity for product_id, item in items.items()}
+
+        product_ids = set(items) | {
+            str(op["product_id"])
+            for op in operations
+            if isinstance(op, dict) and op.get("product_id") is not None
+        }
+        products = {
+            row[0]: row
+            for row in Product.objects.filter(id__in=product_ids)
+            .values_list("id", "stock", "price", "weight")
+        }
+        stock = {product_id: row[1] for product_id, row in products.items()}
+
+        try:
+            apply_cart_ops(operations, quantities, item_products, stock)
+        except BatchError as e:
+            return Response({"message": str(e)}, status=400)
+
+        # Write only the difference: one DELETE, one INSERT, one UPDATE
+        removed, added, changed = [], [], []
+        for product_id, qty in quantities.items():
+            item = items.get(product_id)
+            if item is None:
+                if qty > 0:
+                    added.append(CartItem(cart=cart, product_id=product_id, quantity=qty))
+            elif qty <= 0:
+                removed.append(item.id)
+            elif qty != item.quantity:
+                item.quantity = qty
+                changed.append(item)
+
+        if removed:
+            CartItem.objects.filter(id__in=removed).delete()
+        if added:
+            CartItem.objects.bulk_create(added)
+        if changed:
+            CartItem.objects.bulk_update(changed, ["quantity"])
+        if removed or added or changed:
+            set_cart_totals(cart, [
+                (qty, products[product_id][2], products[product_id][3])
+                for product_id, qty in quantities.items()
+            ])
+
+    return Response(cart_summary(cart))
+
+
+SYNC_MODES = ("replace", "merge")
+
+
+def parse_sync_items(items):
+    """{product_id: quantity} from the payload; repeated products add up."""
+    quantities = {}
+    for item in items:
+        try:
+            product_id = str(item["product_id"])
+            qty = int(item.get("quantity", 1))
+        except (KeyError, TypeError, ValueError):
+            continue
+        quantities[product_id] = quantities.get(product_id, 0) + qty
+    return quantities
+
+
+def take_guest_cart(request):
+    """
+    Items of this session's anonymous cart, which is retired. Call inside
+    the merge's transaction so the guest cart is only retired with it.
+    """
+    cart_id = request.session.pop("cart_id", None)
+    if not cart_id:
+        return {}
+
+    # 🔐 LOCK GUEST CART – a second merge of it waits, then finds it retired
+    guest = Cart.objects.select_for_update().filter(id=cart_id, user=None, is_active=True)
+    if not guest.exists():
+        return {}
+
+    quantities = dict(
+        CartItem.objects.filter(cart_id=cart_id).values_list("product_id", "quantity")
+    )
+    guest.update(is_active=False)
+    return quantities
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def sync_cart(request):
@@ -139,28 +371,62 @@ def sync_cart(request):
     Receive frontend cart and sync it to backend DB for logged-in user.
     Payload example:
     {
+        "mode": "merge",   # optional, default "replace"
         "items": [
             {"product_id": 1, "quantity": 2},
             {"product_id": 5, "quantity": 1}
         ]
     }
+    "replace" swaps the saved cart for the payload; "merge" adds the
+    payload (and this session's guest cart) to it.
     """
     data = request.data
     items = data.get("items", [])
+    mode = data.get("mode", "replace")
 
-    if not items:
-        return Response({"message": "No items to sync"}, status=400)
-
-    cart, _ = Cart.objects.get_or_create(user=request.user, is_active=True)
-    cart.items.all().delete()  # clear old cart
+    if mode not in SYNC_MODES:
+        return Response({"message": f"mode must be one of {', '.join(SYNC_MODES)}"}, status=400)
 
-    for item in items:
-        try:
-            product = Product.objects.get(id=item["product_id"])
-            qty = min(int(item.get("quantity", 1)), product.stock)
-            if qty > 0:
-                CartItem.objects.create(cart=cart, product=product, quantity=qty)
-        except Product.DoesNotExist:
-            continue
+    incoming = parse_sync_items(items)
+    if not incoming and mode == "replace":
+        return Response({"message": "No items to sync"}, status=400)
 
-    return Response({"message": "Cart synced", "cart_id": cart.id})
\ No newline at end of file
+    with transaction.atomic():
+        # 🔐 LOCK CART – concurrent syncs apply one after the other
+        cart = Cart.objects.select_for_update().get(pk=get_active_cart(request.user).pk)
+
+        quantities = {}
+        if mode == "merge":
+            quantities = dict(cart.items.values_list("product_id", "quantity"))
+            for product_id, qty in take_guest_cart(request).items():
+                incoming[product_id] = incoming.get(product_id, 0) + qty
+
+        # One lookup for every product; clamp to stock in memory
+        products = {
+            row[0]: row
+            for row in Product.objects.filter(id__in=set(incoming) | set(quantities))
+            .values_list("id", "stock", "price", "weight")
+        }
+        for product_id, qty in incoming.items():
+            if product_id not in products:
+                continue
+            quantities[product_id] = min(
+                quantities.get(product_id, 0) + qty, products[product_id][1]
+            )
+
+        lines = {
+            product_id: qty
+            for product_id, qty in quantities.items()
+            if qty > 0 and product_id in products
+        }
+        cart.items.all().delete()
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product_id=product_id, quantity=qty)
+            for product_id, qty in lines.items()
+        ])
+        set_cart_totals(cart, [
+            (qty, products[product_id][2], products[product_id][3])
+            for product_id, qty in lines.items()
+        ])
+
+    return Response({"message": "Cart synced", "cart_id": cart.id})
@@ -1,11 +1,12 @@
 import json
 import razorpay
 
-from django.http import JsonResponse
+from django.http import HttpResponseNotModified, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from django.db import transaction
 from django.core.mail import send_mail
+from django.utils.http import parse_etags
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
@@ -14,6 +15,8 @@ from apps.orders.models import (
     Cart, Order, OrderItem,
     PaymentOrder, Payment, Transaction
 )
+from apps.orders.idempotency import idempotent
+from apps.orders.holds import held_quantities, place_holds, release_holds
 from apps.products.models import Product
 
 
@@ -23,74 +26,94 @@ client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_S
 # ====================================================
 # CREATE ORDER + CREATE RAZORPAY ORDER
 # LOGIN REQUIRED
+#
+# Two phases: the order is written and committed first (releasing the
+# cart and product locks), then the Razorpay order is created over HTTPS.
+# PaymentOrders left without a razorpay_order_id are cleaned up by
+# `manage.py recover_payment_orders`.
 # ====================================================
 
-@csrf_exempt
-@api_view(["POST"])
-@permission_classes([IsAuthenticated])
-@transaction.atomic
-def create_product_order(request):
+SHIPPING_COST = 50
+GST_RATE = 0.18
 
-    data = json.loads(request.body or "{}")
-    customer = data.get("customer")
 
-    if not customer:
-        return JsonResponse({"error": "Customer data missing"}, status=400)
+class CheckoutError(Exception):
+    pass
+
+
+def order_totals(subtotal):
+    gst = round((subtotal + SHIPPING_COST) * GST_RATE, 2)
+    return {
+        "subtotal": subtotal,
+        "shipping_cost": SHIPPING_COST,
+        "gst": gst,
+        "total_amount": subtotal + SHIPPING_COST + gst,
+    }
+
 
+@transaction.atomic
+def place_product_order(user, customer):
+    """Phase 1: validate the cart and persist the order, under row locks."""
     # 🔐 LOCK CART
     cart = Cart.objects.select_for_update().filter(
-        user=request.user,
+        user=user,
         is_active=True
     ).first()
 
-    if not cart or not cart.items.exists():
-        return JsonResponse({"error": "Cart is empty"}, status=400)
+    items = list(cart.items.all()) if cart else []
+    if not items:
+        raise CheckoutError("Cart is empty")
 
     subtotal = 0
     total_weight = 0
     validated_items = []
 
     # 🔒 LOCK PRODUCTS (ANTI-OVERSELL)
-    for item in cart.items.select_related("product"):
-        product = Product.objects.select_for_update().get(id=item.product.id)
+    # One query, always in primary-key order, so two checkouts sharing
+    # products lock them in the same sequence and can't deadlock
+    products = Product.objects.select_for_update().filter(
+        id__in={item.product_id for item in items}
+    ).order_by("pk")
+    products_by_id = {product.id: product for product in products}
+
+    # A new checkout replaces this user's earlier, unpaid ones
+    release_holds(payment_order__user=user, payment_order__status="PENDING")
+
+    quantities = {}
+    for item in items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+
+    # Available = stock - units held by other live checkouts
+    held = held_quantities(quantities)
 
-        if product.stock < item.quantity:
-            return JsonResponse(
-                {"error": f"{product.name} is out of stock"},
-                status=400
-            )
+    for item in items:
+        product = products_by_id[item.product_id]
+
+        if product.stock - held.get(product.id, 0) < quantities[product.id]:
+            raise CheckoutError(f"{product.name} is out of stock")
 
         subtotal += product.price * item.quantity
         total_weight += product.weight * item.quantity
 
         validated_items.append((item, product))
 
-    shipping_cost = 50
-    gst = round((subtotal + shipping_cost) * 0.18, 2)
-    total_amount = subtotal + shipping_cost + gst
+    totals = order_totals(subtotal)
+    shipping_cost = totals["shipping_cost"]
+    total_amount = totals["total_amount"]
 
 
     # =========================
     # MASTER PAYMENT ORDER
     # =========================
     payment_order = PaymentOrder.objects.create(
-        user=request.user,
+        user=user,
         order_type="PRODUCT",
         amount=total_amount,
         status="PENDING"
     )
 
-    # =========================
-    # RAZORPAY ORDER
-    # =========================
-    razorpay_order = client.order.create({
-        "amount": int(round(total_amount * 100)),
-        "currency": "INR",
-        "payment_capture": 1
-    })
-
-    payment_order.razorpay_order_id = razorpay_order["id"]
-    payment_order.save()
+    # Keep the units for this customer while they pay
+    place_holds(payment_order, quantities)
 
     # =========================
     # PRODUCT ORDER
@@ -112,13 +135,13 @@ def create_product_order(request):
 
     payment_order.linked_object_id = order.id
     payment_order.linked_app = "orders"
-    payment_order.save()
+    payment_order.save(update_fields=["linked_object_id", "linked_app"])
 
     # =========================
     # ORDER ITEMS SNAPSHOT
     # =========================
-    for item, product in validated_items:
-        OrderItem.objects.create(
+    OrderItem.objects.bulk_create([
+        OrderItem(
             order=order,
             product=product,
             product_name=product.name,
@@ -126,15 +149,108 @@ def create_product_order(request):
             quantity=item.quantity,
             weight_kg=product.weight
         )
+        for item, product in validated_items
+    ])
+
+    return order, payment_order
+
+
+def create_gateway_order(payment_order):
+    """Phase 2: create the Razorpay order – no database locks held."""
+    razorpay_order = client.order.create({
+        "amount": int(round(payment_order.amount * 100)),
+        "currency": "INR",
+        "payment_capture": 1,
+        # Lets a Razorpay order be traced back to us during recovery
+        "receipt": f"payment_order_{payment_order.id}",
+    })
+
+    payment_order.razorpay_order_id = razorpay_order["id"]
+    payment_order.save(update_fields=["razorpay_order_id"])
+    return razorpay_order["id"]
+
+
+@csrf_exempt
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@idempotent
+def create_product_order(request):
+
+    data = json.loads(request.body or "{}")
+    customer = data.get("customer")
+
+    if not customer:
+        return JsonResponse({"error": "Customer data missing"}, status=400)
+
+    try:
+        order, payment_order = place_product_order(request.user, customer)
+    except CheckoutError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    try:
+        razorpay_order_id = create_gateway_order(payment_order)
+    except Exception as e:
+        print("❌ Razorpay order failed:", e)
+        release_holds(payment_order=payment_order)
+        return JsonResponse(
+            {"error": "Payment gateway unavailable, please try again"},
+            status=502
+        )
 
     return JsonResponse({
         "order_id": order.id,
-        "razorpay_order_id": razorpay_order["id"],
-        "amount": int(total_amount * 100),
+        "razorpay_order_id": razorpay_order_id,
+        "amount": int(payment_order.amount * 100),
         "currency": "INR",
         "key": settings.RAZORPAY_KEY_ID
     })
 
+# ====================================================
+# CHECKOUT QUOTE
+# LOGIN REQUIRED
+#
+# Totals for the checkout page without creating any order or calling
+# Razorpay. Read from the cart's stored totals – no item query. Every
+# change to the cart or its products' prices bumps Cart.version, so the
+# version is the quote's cache key (ETag) and unchanged carts get a 304.
+# ====================================================
+
+def quote_etag(cart):
+    return f'"quote-{cart.id}-{cart.version}"'
+
+
+def quote_cart(cart):
+    if not cart.item_count:
+        raise CheckoutError("Cart is empty")
+
+    return {
+        "item_count": cart.item_count,
+        "total_weight": round(cart.total_weight, 3),
+        **order_totals(cart.subtotal),
+    }
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def checkout_quote(request):
+    cart = Cart.objects.filter(user=request.user, is_active=True).first()
+
+    try:
+        if cart is None:
+            raise CheckoutError("Cart is empty")
+        etag = quote_etag(cart)
+        if etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+            response = HttpResponseNotModified()
+        else:
+            response = JsonResponse(quote_cart(cart))
+    except CheckoutError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def my_orders(request):
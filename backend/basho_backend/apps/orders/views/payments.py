@@ -6,11 +6,16 @@ from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.db import transaction
+from django.db.models import F
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
+from apps.orders.cart_totals import set_cart_totals
 from apps.orders.models import Cart
 from apps.orders.models import PaymentOrder, Payment, Transaction
 from apps.orders.models import OrderItem
+from apps.orders.idempotency import idempotent, retryable
+from apps.orders.holds import convert_holds, held_subquery, release_holds
+from apps.products.inventory import movement, record_movements
 from apps.products.models import Product
 from apps.experiences.models import Booking, WorkshopRegistration
  
@@ -81,6 +86,36 @@ def confirm_workshop_registration(payment_order):
 # PRODUCT CONFIRMATION
 # ====================================================
 
+def deduct_stock(payment_order, items):
+    """
+    Conditional UPDATE ... SET stock = stock - q WHERE stock - held >= q
+    per product, where `held` counts live holds of *other* checkouts.
+    Runs in primary-key order so concurrent confirmations can't deadlock.
+    Raises if any product is short; the caller's transaction then rolls
+    back every deduction already made.
+    """
+    quantities = {}
+    names = {}
+    for item in items:
+        if item.product_id is None:  # product deleted since checkout
+            continue
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+        names[item.product_id] = item.product_name
+
+    held = held_subquery(exclude_payment_order=payment_order)
+
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        updated = Product.objects.filter(
+            id=product_id, stock__gte=held + quantity
+        ).update(stock=F("stock") - quantity)
+
+        if not updated:
+            raise Exception(f"{names[product_id]} stock insufficient")
+
+    return quantities
+
+
 def confirm_product_order(payment_order):
     with transaction.atomic():
         order = payment_order.product_order
@@ -88,15 +123,20 @@ def confirm_product_order(payment_order):
         if order.status == "paid":
             return
 
-        # 🔒 Lock products and reduce stock
-        for item in order.items.select_related("product"):
-            product = Product.objects.select_for_update().get(id=item.product.id)
-
-            if product.stock < item.quantity:
-                raise Exception(f"{product.name} stock insufficient")
-
-            product.stock -= item.quantity
-            product.save()
+        # 🔒 Reduce stock – never below zero, all or nothing
+        sold = deduct_stock(payment_order, order.items.all())
+        converted = convert_holds(payment_order)
+
+        # 📒 One ledger row per product: units out, hold (if any) cleared
+        record_movements(
+            movement(
+                product_id, "sale",
+                stock_delta=-quantity,
+                held_delta=-converted.get(product_id, 0),
+                reference=f"payment_order:{payment_order.pk}",
+            )
+            for product_id, quantity in sold.items()
+        )
 
         # ✅ Mark order paid
         order.status = "paid"
@@ -142,17 +182,20 @@ def clear_user_cart(payment_order):
     if not payment_order.user:
         return  # guest checkout → no cart to clear
 
-    cart = Cart.objects.filter(
-        user=payment_order.user,
-        is_active=True
-    ).first()
+    # Runs after confirm_product_order's transaction has closed
+    with transaction.atomic():
+        cart = Cart.objects.select_for_update().filter(
+            user=payment_order.user,
+            is_active=True
+        ).first()
 
-    if not cart:
-        return
+        if not cart:
+            return
 
-    cart.items.all().delete()
-    cart.is_active = False   # optional but recommended
-    cart.save()
+        cart.items.all().delete()
+        set_cart_totals(cart, [])
+        cart.is_active = False   # optional but recommended
+        cart.save(update_fields=["is_active"])
 
     print("🧹 Cart cleared for user:", payment_order.user.id)
 # ====================================================
@@ -161,6 +204,7 @@ def clear_user_cart(payment_order):
 
 @csrf_exempt
 @api_view(["POST"])
+@idempotent
 def verify_payment(request):
     if request.method != "POST":
         return JsonResponse({"error": "POST request required"}, status=405)
@@ -191,11 +235,14 @@ def verify_payment(request):
             payment_order.status = "PAID"
             payment_order.save()
 
-            # 3️⃣ Create payment record
-            payment = Payment.objects.create(
+            # 3️⃣ Create payment record (or settle the one an earlier,
+            # failed attempt left behind)
+            payment, _ = Payment.objects.update_or_create(
                 payment_order=payment_order,
-                razorpay_payment_id=razorpay_payment_id,
-                status="PAID"
+                defaults={
+                    "razorpay_payment_id": razorpay_payment_id,
+                    "status": "PAID",
+                },
             )
 
             # 4️⃣ Transaction log
@@ -227,11 +274,14 @@ def verify_payment(request):
 
             payment_order.status = "FAILED"
             payment_order.save()
+            release_holds(payment_order=payment_order)
 
-            payment = Payment.objects.create(
+            payment, _ = Payment.objects.update_or_create(
                 payment_order=payment_order,
-                razorpay_payment_id=razorpay_payment_id or "FAILED",
-                status="FAILED"
+                defaults={
+                    "razorpay_payment_id": razorpay_payment_id or "FAILED",
+                    "status": "FAILED",
+                },
             )
 
             Transaction.objects.create(
@@ -242,7 +292,8 @@ def verify_payment(request):
         except Exception:
             pass
 
-        return JsonResponse(
+        # The failure may be transient – don't replay it to retries
+        return retryable(JsonResponse(
             {"error": "Payment verification failed"},
             status=400
-        )
+        ))
@@ -1,9 +1,12 @@
 from django.contrib import admin
-from .models import Product, Category,CustomOrder, CustomOrderImage
+from .models import Product, Category,CustomOrder, CustomOrderImage, InventoryMovement
 from django.urls import path
 from django.utils.html import format_html
 from .admin_views import send_custom_order_email
+from .export import schedule_catalog_export
+from .inventory import movement, record_movements
 from django.urls import reverse
+from django.db import transaction
 
 import os
 from django.core.mail import send_mail
@@ -25,11 +28,90 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ("category", "featured")
     search_fields = ("name",)
 
+    # Rebuild the static catalog exports for the touched categories only
+    def save_model(self, request, obj, form, change):
+        slugs = {obj.category.slug}
+        if change and "category" in form.changed_data:
+            slugs |= set(
+                Product.objects.filter(pk=obj.pk).values_list("category__slug", flat=True)
+            )
+        with transaction.atomic():
+            delta = 0
+            if change:
+                # 🔐 Sales may have changed stock since the form loaded:
+                # apply the admin's edit as a difference to the locked row
+                # instead of writing the form's (stale) number over it
+                current = (
+                    Product.objects.select_for_update()
+                    .values_list("stock", flat=True)
+                    .get(pk=obj.pk)
+                )
+                edited = obj.stock - form.initial.get("stock", obj.stock)
+                obj.stock = max(current + edited, 0)
+                delta = obj.stock - current
+
+            super().save_model(request, obj, form, change)
+
+            # Ledger row for a manual stock edit
+            if delta:
+                record_movements([movement(
+                    obj.pk, "restock" if delta > 0 else "adjustment",
+                    stock_delta=delta,
+                    reference=f"admin:{request.user.pk}",
+                )])
+        schedule_catalog_export(slugs)
+
+    def delete_model(self, request, obj):
+        slug = obj.category.slug
+        super().delete_model(request, obj)
+        schedule_catalog_export({slug})
+
+    def delete_queryset(self, request, queryset):
+        slugs = set(queryset.values_list("category__slug", flat=True))
+        super().delete_queryset(request, queryset)
+        schedule_catalog_export(slugs)
+
+
+@admin.register(InventoryMovement)
+class InventoryMovementAdmin(admin.ModelAdmin):
+    # Append-only: corrections are new "adjustment" rows
+    list_display = ("created_at", "product", "kind", "stock_delta", "held_delta", "reference")
+    list_filter = ("kind",)
+    search_fields = ("product__id", "product__name", "reference")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {"slug": ("name",)}
 
+    def save_model(self, request, obj, form, change):
+        slugs = {obj.slug}
+        if change and "slug" in form.changed_data:
+            slugs |= set(
+                Category.objects.filter(pk=obj.pk).values_list("slug", flat=True)
+            )
+        super().save_model(request, obj, form, change)
+        schedule_catalog_export(slugs)
+
+    def delete_model(self, request, obj):
+        slug = obj.slug
+        super().delete_model(request, obj)
+        schedule_catalog_export({slug})
+
+    def delete_queryset(self, request, queryset):
+        slugs = set(queryset.values_list("slug", flat=True))
+        super().delete_queryset(request, queryset)
+        schedule_catalog_export(slugs)
+
 class CustomOrderImageInline(admin.TabularInline):
     model = CustomOrderImage
     extra = 0
@@ -0,0 +1,260 @@
+import csv
+import json
+
+from django.db import transaction
+
+from apps.orders.cart_totals import refresh_carts_for_products
+
+from .cache import bump_catalog_version
+from .inventory import movement, record_movements
+from .models import Category, Product
+from .search import PRODUCT_SEARCH_VECTOR
+
+
+# Column order for export, using model field names. Categories travel as
+# their slug.
+PRODUCT_FIELDS = (
+    "id",
+    "category",
+    "name",
+    "description",
+    "long_description",
+    "price",
+    "stock",
+    "weight",
+    "featured",
+    "is_customizable",
+    "is_food_safe",
+    "is_microwave_safe",
+    "is_dishwasher_safe",
+    "images",
+    "available_colors",
+    "features",
+    "materials",
+    "care_instructions",
+    "dimensions",
+    "related_products",
+)
+
+# Needed to insert a product. Feeds without them (e.g. id,price,stock)
+# can only update products that already exist.
+REQUIRED_FIELDS = ("id", "category", "name", "description", "price", "stock", "weight")
+
+INT_FIELDS = {"price", "stock"}
+BOOL_FIELDS = {
+    "featured", "is_customizable",
+    "is_food_safe", "is_microwave_safe", "is_dishwasher_safe",
+}
+JSON_FIELDS = {
+    "images", "available_colors", "features", "materials",
+    "care_instructions", "dimensions", "related_products",
+}
+
+FORMATS = ("csv", "jsonl")
+
+
+class RowError(ValueError):
+    pass
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    if path.endswith(".csv"):
+        return "csv"
+    if path.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    raise ValueError("Cannot tell the format from the file name, pass --format")
+
+
+# =========================
+# READING
+# =========================
+
+def read_records(fh, fmt):
+    """Yield (line number, dict) pairs, one at a time."""
+    if fmt == "csv":
+        reader = csv.DictReader(fh)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for line_no, line in enumerate(fh, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None  # reported by ProductRowParser.parse()
+        yield line_no, record
+
+
+def check_columns(columns):
+    unknown = set(columns) - set(PRODUCT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown column(s): {', '.join(sorted(unknown))}")
+
+    if "id" not in columns:
+        raise ValueError("Missing column: id")
+    if not set(columns) - {"id"}:
+        raise ValueError("Nothing to import besides id")
+
+
+def missing_columns(columns):
+    """Required columns a feed lacks; its rows cannot create products."""
+    return sorted(set(REQUIRED_FIELDS) - set(columns))
+
+
+class ProductRowParser:
+    """
+    Turns raw records into unsaved Product instances.
+
+    CSV cells are strings (JSON columns hold JSON text); JSONL values
+    arrive already typed. Categories are resolved by slug from one query.
+    """
+
+    def __init__(self, columns, text_cells):
+        self.columns = tuple(columns)
+        self.text_cells = text_cells
+        self.category_ids = dict(Category.objects.values_list("slug", "id"))
+
+    def parse(self, record):
+        if not isinstance(record, dict):
+            raise RowError("not a JSON object")
+
+        values = {}
+        for column in self.columns:
+            if column not in record:
+                raise RowError(f"missing {column}")
+            values[column] = self.parse_value(column, record[column])
+
+        if "category" in values:
+            slug = values.pop("category")
+            if slug not in self.category_ids:
+                raise RowError(f"unknown category {slug!r}")
+            values["category_id"] = self.category_ids[slug]
+
+        return Product(**values)
+
+    def parse_value(self, column, value):
+        if value is None or (self.text_cells and value == ""):
+            if column in REQUIRED_FIELDS:
+                raise RowError(f"{column} is required")
+            return Product._meta.get_field(column).get_default()
+
+        try:
+            if column in INT_FIELDS:
+                value = int(value)
+                if value < 0:
+                    raise ValueError("must not be negative")
+            elif column == "weight":
+                value = float(value)
+            elif column in BOOL_FIELDS:
+                value = self.parse_bool(value)
+            elif column in JSON_FIELDS and self.text_cells:
+                value = json.loads(value)
+            elif column not in JSON_FIELDS:
+                value = str(value)
+        except (TypeError, ValueError) as e:
+            raise RowError(f"{column}: {e}")
+
+        return value
+
+    @staticmethod
+    def parse_bool(value):
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in ("1", "true", "yes"):
+            return True
+        if text in ("0", "false", "no", ""):
+            return False
+        raise ValueError(f"expected true or false, got {value!r}")
+
+
+# =========================
+# WRITING
+# =========================
+
+def upsert_batch(products, columns):
+    """
+    INSERT ... ON CONFLICT (id) DO UPDATE for one batch, then refresh the
+    search vectors, the inventory ledger, the cart totals and the catalog
+    version – bulk_create skips the post_save signals that normally do
+    those.
+
+    Only `columns` are written. A feed without every REQUIRED_FIELDS
+    column can only update existing products: its rows for unknown ids
+    are skipped. Returns the ids that were written.
+    """
+    # ON CONFLICT cannot touch the same row twice in one statement
+    products = list({p.id: p for p in products}.values())
+    update_fields = [c if c != "category" else "category_id" for c in columns if c != "id"]
+
+    with transaction.atomic():
+        # Stored stock before the upsert, locked, for the ledger rows
+        old_stock = dict(
+            Product.objects.select_for_update()
+            .filter(id__in=[p.id for p in products])
+            .order_by("pk")
+            .values_list("id", "stock")
+        )
+
+        if missing_columns(columns):
+            products = [p for p in products if p.id in old_stock]
+            if products:
+                Product.objects.bulk_update(products, update_fields)
+        else:
+            Product.objects.bulk_create(
+                products,
+                update_conflicts=True,
+                unique_fields=["id"],
+                update_fields=update_fields,
+            )
+
+        ids = [p.id for p in products]
+        if not ids:
+            return ids
+
+        Product.objects.filter(id__in=ids).update(search_vector=PRODUCT_SEARCH_VECTOR)
+        if "stock" in columns:
+            record_movements(
+                movement(p.id, "adjustment", stock_delta=p.stock - old_stock[p.id], reference="import")
+                if p.id in old_stock
+                else movement(p.id, "opening", stock_delta=p.stock, reference="import")
+                for p in products
+            )
+        if {"price", "weight"} & set(columns):
+            refresh_carts_for_products(ids)
+        bump_catalog_version()
+
+    return ids
+
+
+def export_rows(queryset):
+    """Yield one dict per product without loading the table."""
+    paths = ["category__slug" if f == "category" else f for f in PRODUCT_FIELDS]
+    for row in queryset.order_by("id").values_list(*paths).iterator(chunk_size=2000):
+        yield dict(zip(PRODUCT_FIELDS, row))
+
+
+def write_records(fh, fmt, rows):
+    """Stream `rows` to `fh`; returns how many were written."""
+    count = 0
+
+    if fmt == "jsonl":
+        for row in rows:
+            fh.write(json.dumps(row, ensure_ascii=False))
+            fh.write("\n")
+            count += 1
+        return count
+
+    writer = csv.DictWriter(fh, fieldnames=PRODUCT_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        for key in JSON_FIELDS:
+            if row[key] is not None:
+                row[key] = json.dumps(row[key], ensure_ascii=False)
+        writer.writerow(row)
+        count += 1
+    return count
@@ -0,0 +1,101 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import F
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from .models import CatalogVersion
+
+
+CATALOG_KEY = "catalog"
+
+# Responses are keyed by version, so they never go stale – the timeout
+# only bounds how long unused versions linger in the cache.
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Product content (names, text, images) is allowed to sit in browser and
+# CDN caches; live stock comes from the availability endpoint.
+CONTENT_CACHE_CONTROL = "public, max-age=21600"
+AVAILABILITY_CACHE_CONTROL = "public, max-age=10"
+
+
+# =========================
+# CATALOG VERSION
+# =========================
+
+def get_catalog_version(key=CATALOG_KEY):
+    version = (
+        CatalogVersion.objects.filter(key=key)
+        .values_list("version", flat=True)
+        .first()
+    )
+    return version or 0
+
+
+def bump_catalog_version(key=CATALOG_KEY):
+    updated = CatalogVersion.objects.filter(key=key).update(
+        version=F("version") + 1
+    )
+    if not updated:
+        CatalogVersion.objects.get_or_create(key=key, defaults={"version": 1})
+
+
+# =========================
+# RESPONSE CACHE
+# =========================
+
+def _request_signature(request):
+    # Sorted query params so ?a=1&b=2 and ?b=2&a=1 share one entry
+    params = sorted(
+        (k, v) for k in request.GET for v in request.GET.getlist(k)
+    )
+    return f"{request.path}?{params}"
+
+
+def catalog_digest(version, request):
+    return hashlib.sha1(
+        f"{version}:{_request_signature(request)}".encode()
+    ).hexdigest()
+
+
+class CatalogCacheMixin:
+    """
+    Caches rendered list responses per catalog version and request path
+    (category slug + query string) and answers repeat visitors with 304s.
+    """
+
+    catalog_cache_timeout = CATALOG_CACHE_TIMEOUT
+
+    def list(self, request, *args, **kwargs):
+        # Kept on the view so the columnar catalog reuses the lookup
+        self.catalog_version = get_catalog_version()
+        digest = catalog_digest(self.catalog_version, request)
+        etag = f'"{digest}"'
+
+        if_none_match = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+        if etag in if_none_match or "*" in if_none_match:
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+        cache_key = f"products:list:{digest}"
+        body = cache.get(cache_key)
+
+        if body is None:
+            response = super().list(request, *args, **kwargs)
+            body = JSONRenderer().render(response.data)
+
+            # Built from data older than this version (see columnar.py)
+            if not getattr(self, "response_cacheable", True):
+                response = HttpResponse(body, content_type="application/json")
+                response["Cache-Control"] = "no-cache"
+                return response
+
+            cache.set(cache_key, body, self.catalog_cache_timeout)
+
+        response = HttpResponse(body, content_type="application/json")
+        response["ETag"] = etag
+        response["Cache-Control"] = CONTENT_CACHE_CONTROL
+        return response
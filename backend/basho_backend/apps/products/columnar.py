@@ -0,0 +1,251 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from django.db import connections
+
+from .cache import get_catalog_version
+from .encoders import ProductRowEncoder
+from .models import Product
+
+
+FLAG_FIELDS = ("is_food_safe", "is_microwave_safe", "is_dishwasher_safe")
+
+# Only what mask() and the sort keys need; payloads are read per page
+COLUMN_PATHS = (
+    "id", "price", "featured", "created_at", "category__slug", *FLAG_FIELDS,
+)
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def _micros(value):
+    return (value - EPOCH) // ONE_MICROSECOND
+
+
+class CatalogMiss(LookupError):
+    """The snapshot cannot answer this request; use the database."""
+
+
+class ColumnarCatalog:
+    """
+    Read-only, process-local snapshot of every Product's filter and sort
+    columns.
+
+    The columns are NumPy arrays (one slot per product), so finding a
+    page is a couple of vectorised mask operations plus a slice – no SQL.
+    Orderings are computed once per snapshot, which turns "filter, sort,
+    take a page" into "walk a presorted index through a mask". Only the
+    page's payloads are then read, by primary key.
+
+    Snapshots are never mutated; a newer catalog version gets a fresh one
+    (see get_columnar_catalog()).
+    """
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.size = len(rows)
+
+        def column(name, dtype):
+            return np.fromiter(
+                (getattr(row, name) for row in rows), dtype=dtype, count=self.size
+            )
+
+        # Rows arrive in the database's id order, so a row's index is its
+        # id rank under the database collation – ties break exactly as
+        # they do on the ORM path
+        self.ids = [row.id for row in rows]
+        self.id_rank = np.arange(self.size, dtype=np.float64)
+        self.id_ranks = {pk: rank for rank, pk in enumerate(self.ids)}
+
+        self.price = column("price", np.int64)
+        self.featured = column("featured", np.bool_)
+        self.flags = {field: column(field, np.bool_) for field in FLAG_FIELDS}
+
+        # Raw values, handed back to the keyset paginator for cursors
+        self.created_at = [row.created_at for row in rows]
+        self.created_us = np.fromiter(
+            (_micros(value) for value in self.created_at),
+            dtype=np.int64, count=self.size,
+        )
+
+        slugs, self.category = np.unique(
+            np.array([row.category__slug for row in rows], dtype=str),
+            return_inverse=True,
+        )
+        self.category_codes = {slug: code for code, slug in enumerate(slugs)}
+
+        self._orders = {}
+
+    @classmethod
+    def build(cls, version):
+        rows = list(Product.objects.order_by("id").values_list(*COLUMN_PATHS, named=True))
+        return cls(version, rows)
+
+    # ------------------------
+    # FILTERING
+    # ------------------------
+
+    def mask(self, category=None, featured=None, flags=None,
+             min_price=None, max_price=None):
+        mask = np.ones(self.size, dtype=bool)
+
+        if category is not None:
+            code = self.category_codes.get(category)
+            if code is None:
+                return np.zeros(self.size, dtype=bool)
+            mask &= self.category == code
+
+        if featured is not None:
+            mask &= self.featured == featured
+
+        for field, value in (flags or {}).items():
+            mask &= self.flags[field] == value
+
+        if min_price is not None:
+            mask &= self.price >= min_price
+        if max_price is not None:
+            mask &= self.price <= max_price
+
+        return mask
+
+    # ------------------------
+    # SORTING / PAGING
+    # ------------------------
+
+    def sort_key(self, field):
+        """Column for `field` ("-" prefix = descending) in ascending order."""
+        name = field.lstrip("-")
+        column = {
+            "id": self.id_rank,
+            "price": self.price,
+            "featured": self.featured.astype(np.int64),
+            "created_at": self.created_us,
+        }[name]
+        return -column if field.startswith("-") else column
+
+    def sort_value(self, field, value):
+        """Cursor value for `field` on the same scale as sort_key()."""
+        name = field.lstrip("-")
+        if name == "id":
+            if value not in self.id_ranks:
+                # Gone since the cursor was issued: only the database
+                # collation knows where it sorts among the others
+                raise CatalogMiss(value)
+            value = self.id_ranks[value]
+        elif name == "created_at":
+            value = _micros(value)
+        else:
+            value = int(value)
+        return -value if field.startswith("-") else value
+
+    def order(self, ordering):
+        ordering = tuple(ordering)
+        if ordering not in self._orders:
+            # lexsort treats the last key as the primary one
+            keys = [self.sort_key(field) for field in reversed(ordering)]
+            self._orders[ordering] = np.lexsort(keys)
+        return self._orders[ordering]
+
+    def after(self, ordering, position):
+        """Mask of rows strictly after `position` in `ordering`."""
+        after = np.zeros(self.size, dtype=bool)
+        tied = np.ones(self.size, dtype=bool)
+        for field, value in zip(ordering, position):
+            key, value = self.sort_key(field), self.sort_value(field, value)
+            after |= tied & (key > value)
+            tied &= key == value
+        return after
+
+    def select(self, mask, ordering=("-created_at", "-id"), position=None, limit=None):
+        """Row indexes matching `mask`, in `ordering`, after `position`."""
+        if position is not None:
+            mask = mask & self.after(ordering, position)
+
+        order = self.order(ordering)
+        hits = order[mask[order]]
+        return hits if limit is None else hits[:limit]
+
+    def position(self, index, ordering):
+        """Raw sort values of one row, as the keyset cursor stores them."""
+        values = {
+            "id": self.ids[index],
+            "price": int(self.price[index]),
+            "featured": bool(self.featured[index]),
+            "created_at": self.created_at[index],
+        }
+        return [values[field.lstrip("-")] for field in ordering]
+
+    def encode(self, hits, fields=None):
+        """Payloads of the rows at `hits`, in order, from one id__in query."""
+        ids = [self.ids[i] for i in hits]
+        if not ids:
+            return []
+
+        encoder = ProductRowEncoder(fields, extra=("id",))
+        rows = {row.id: row for row in encoder.rows(Product.objects.filter(id__in=ids))}
+        # Products deleted since the snapshot was built are dropped
+        return encoder.encode(rows[pk] for pk in ids if pk in rows)
+
+
+# =========================
+# PROCESS-WIDE SNAPSHOT
+# =========================
+
+_snapshot = None
+_build_lock = threading.Lock()
+_rebuilding = False
+
+
+def get_columnar_catalog(version=None):
+    """
+    This process's snapshot. Once the catalog version moves past it, a
+    new one is built in a background thread and the previous snapshot
+    keeps answering until it is published with a single reference swap.
+    Only the very first lookup builds synchronously.
+    """
+    global _snapshot
+
+    if version is None:
+        version = get_catalog_version()
+
+    snapshot = _snapshot
+    if snapshot is not None:
+        if snapshot.version != version:
+            _rebuild_in_background(version)
+        return snapshot
+
+    with _build_lock:
+        if _snapshot is None:
+            _snapshot = ColumnarCatalog.build(version)
+        return _snapshot
+
+
+def _rebuild_in_background(version):
+    global _rebuilding
+
+    with _build_lock:
+        if _rebuilding:
+            return
+        _rebuilding = True
+
+    threading.Thread(target=_rebuild, args=(version,), daemon=True).start()
+
+
+def _rebuild(version):
+    global _snapshot, _rebuilding
+
+    try:
+        snapshot = ColumnarCatalog.build(version)
+        with _build_lock:
+            _snapshot = snapshot
+    except Exception:
+        logger.exception("Columnar catalog rebuild failed")
+    finally:
+        with _build_lock:
+            _rebuilding = False
+        connections.close_all()
@@ -0,0 +1,42 @@
+from .serializers import ProductSerializer
+
+
+# (API key, ORM path) for every ProductSerializer field, in output order
+PRODUCT_COLUMNS = tuple(
+    zip(
+        ProductSerializer.Meta.fields,
+        ProductSerializer.model_fields_for(ProductSerializer.Meta.fields),
+    )
+)
+
+
+class ProductRowEncoder:
+    """
+    Fast path for ProductSerializer on list pages.
+
+    The column list is resolved once, rows come straight from
+    values_list(), and each row becomes a dict with a single zip() – no
+    per-field to_representation() calls. The values Postgres hands back
+    are already what ProductSerializer would emit (str / int / float /
+    bool / decoded JSON), so the output is identical.
+
+    `extra` columns are selected but not emitted; they let the keyset
+    paginator read sort keys off the (named) rows.
+    """
+
+    def __init__(self, fields=None, extra=("id", "price", "featured", "created_at")):
+        selected = [
+            (key, path) for key, path in PRODUCT_COLUMNS
+            if fields is None or key in fields
+        ]
+        self.keys = tuple(key for key, _ in selected)
+
+        paths = [path for _, path in selected]
+        self.paths = tuple(paths + [p for p in extra if p not in paths])
+
+    def rows(self, queryset):
+        return queryset.values_list(*self.paths, named=True)
+
+    def encode(self, rows):
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in rows]
@@ -0,0 +1,227 @@
+import fcntl
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from .encoders import ProductRowEncoder
+from .models import Category, Product
+
+try:
+    import brotli
+except ImportError:  # gzip-only exports when Brotli is not installed
+    brotli = None
+
+
+# Written under STATIC_ROOT so WhiteNoise serves them (with the .gz/.br
+# siblings picked by Accept-Encoding) without reaching a Django view.
+EXPORT_SUBDIR = "catalog"
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".export.lock"
+
+# Full exports (manage.py export_catalog) squeeze the files as far as
+# Brotli goes; incremental ones after an edit trade a few percent of
+# size for a much shorter run
+FULL_BROTLI_QUALITY = 11
+INCREMENTAL_BROTLI_QUALITY = 5
+
+logger = logging.getLogger(__name__)
+
+
+def export_dir():
+    return Path(settings.STATIC_ROOT) / EXPORT_SUBDIR
+
+
+def export_url(filename):
+    return f"{settings.STATIC_URL}{EXPORT_SUBDIR}/{filename}"
+
+
+# =========================
+# FILE WRITING
+# =========================
+
+def _atomic_write(path, data):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+def write_export(name, payload, brotli_quality=FULL_BROTLI_QUALITY):
+    """
+    Write `payload` as <name>.<hash>.json plus .gz / .br variants.
+    Returns the filename.
+    """
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    digest = hashlib.sha256(body).hexdigest()[:12]
+    filename = f"{name}.{digest}.json"
+
+    directory = export_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / filename
+
+    if not path.exists():
+        # Compressed variants first: WhiteNoise only looks for them when
+        # it first sees the uncompressed file
+        _atomic_write(directory / f"{filename}.gz", gzip.compress(body, 9, mtime=0))
+        if brotli is not None:
+            _atomic_write(
+                directory / f"{filename}.br", brotli.compress(body, quality=brotli_quality)
+            )
+        _atomic_write(path, body)
+
+    return filename
+
+
+@contextmanager
+def export_lock():
+    """
+    Exclusive lock across processes for one export run: the manifest
+    update and the prune that follows it must not interleave with
+    another run's, or each could delete the files the other published.
+    """
+    directory = export_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / LOCK_NAME, "w") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def read_manifest():
+    try:
+        return json.loads((export_dir() / MANIFEST_NAME).read_bytes())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def write_manifest(manifest):
+    export_dir().mkdir(parents=True, exist_ok=True)
+    _atomic_write(
+        export_dir() / MANIFEST_NAME,
+        json.dumps(manifest, indent=2, sort_keys=True).encode(),
+    )
+
+
+# =========================
+# CATALOG EXPORTS
+# =========================
+
+def _encoded(queryset):
+    encoder = ProductRowEncoder(extra=())
+    return encoder.encode(encoder.rows(queryset.order_by("-created_at", "-id")))
+
+
+def export_catalog(category_slugs=None):
+    """
+    Rebuild the full and featured lists and the given category lists
+    (all categories when `category_slugs` is None), then update the
+    manifest. Returns the manifest.
+    """
+    with export_lock():
+        return _export_catalog(category_slugs)
+
+
+def _export_catalog(category_slugs):
+    products = Product.objects.all()
+    manifest = read_manifest() if category_slugs is not None else {}
+    quality = FULL_BROTLI_QUALITY if category_slugs is None else INCREMENTAL_BROTLI_QUALITY
+
+    manifest["all"] = export_url(write_export("all", _encoded(products), quality))
+    manifest["featured"] = export_url(
+        write_export("featured", _encoded(products.filter(featured=True)), quality)
+    )
+
+    categories = Category.objects.all()
+    if category_slugs is not None:
+        categories = categories.filter(slug__in=category_slugs)
+
+    existing = set()
+    for category in categories:
+        key = f"category-{category.slug}"
+        manifest[key] = export_url(
+            write_export(key, _encoded(products.filter(category=category)), quality)
+        )
+        existing.add(category.slug)
+
+    # Categories that were renamed or deleted since the last export
+    for slug in set(category_slugs or ()) - existing:
+        manifest.pop(f"category-{slug}", None)
+
+    write_manifest(manifest)
+    prune_exports(manifest)
+    return manifest
+
+
+def prune_exports(manifest):
+    """Delete exported files (and their .gz/.br) the manifest no longer lists."""
+    current = {url.rsplit("/", 1)[-1] for url in manifest.values()}
+
+    for path in export_dir().iterdir():
+        # The manifest, the lock file and in-flight temp files
+        if path.name == MANIFEST_NAME or path.name.startswith("."):
+            continue
+        base = path.name.removesuffix(".gz").removesuffix(".br")
+        if base not in current:
+            path.unlink(missing_ok=True)
+
+
+# =========================
+# BACKGROUND EXPORTS
+# =========================
+
+_queue_lock = threading.Lock()
+_queued = None  # slugs waiting for the exporter thread, None if nothing is
+_running = False
+
+
+def schedule_catalog_export(category_slugs):
+    """
+    Incremental rebuild once the surrounding transaction commits, in a
+    background thread so the request (an admin save) does not wait for
+    it. Changes arriving while a run is in progress are merged into one
+    follow-up run.
+    """
+    slugs = {slug for slug in category_slugs if slug}
+    transaction.on_commit(lambda: _queue_export(slugs))
+
+
+def _queue_export(slugs):
+    global _queued, _running
+
+    with _queue_lock:
+        _queued = slugs if _queued is None else _queued | slugs
+        if _running:
+            return
+        _running = True
+
+    threading.Thread(target=_export_queued, daemon=True).start()
+
+
+def _export_queued():
+    global _queued, _running
+
+    try:
+        while True:
+            with _queue_lock:
+                slugs, _queued = _queued, None
+                if slugs is None:
+                    _running = False
+                    return
+            try:
+                export_catalog(sorted(slugs))
+            except Exception:
+                logger.exception("Catalog export failed")
+    finally:
+        connections.close_all()
@@ -0,0 +1,169 @@
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+FLAG_PARAMS = {
+    "food_safe": "is_food_safe",
+    "microwave_safe": "is_microwave_safe",
+    "dishwasher_safe": "is_dishwasher_safe",
+}
+
+TRUE_VALUES = {"1", "true", "yes"}
+FALSE_VALUES = {"0", "false", "no"}
+
+
+class ProductFacetFilter(BaseFilterBackend):
+    """
+    ?color=Earth Brown&color=Matte White   (any of, matched on name)
+    ?material=Stoneware clay                (any of)
+    ?food_safe=true&microwave_safe=false&dishwasher_safe=true
+    ?min_price=500&max_price=3000
+
+    Colour and material use jsonb containment (@>) so the GIN indexes on
+    those columns do the work.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        colors = params.getlist("color")
+        if colors:
+            condition = Q()
+            for color in colors:
+                condition |= Q(available_colors__contains=[{"name": color}])
+            queryset = queryset.filter(condition)
+
+        materials = params.getlist("material")
+        if materials:
+            condition = Q()
+            for material in materials:
+                condition |= Q(materials__contains=[material])
+            queryset = queryset.filter(condition)
+
+        for param, field in FLAG_PARAMS.items():
+            if param in params:
+                queryset = queryset.filter(**{field: self.parse_bool(params, param)})
+
+        if "min_price" in params:
+            queryset = queryset.filter(price__gte=self.parse_int(params, "min_price"))
+        if "max_price" in params:
+            queryset = queryset.filter(price__lte=self.parse_int(params, "max_price"))
+
+        return queryset
+
+    def catalog_filters(self, request):
+        """
+        The same filters as keyword arguments for ColumnarCatalog.mask(),
+        or None when colour / material filters need the database.
+        """
+        params = request.query_params
+        if "color" in params or "material" in params:
+            return None
+
+        filters = {
+            "flags": {
+                field: self.parse_bool(params, param)
+                for param, field in FLAG_PARAMS.items()
+                if param in params
+            },
+        }
+        if "min_price" in params:
+            filters["min_price"] = self.parse_int(params, "min_price")
+        if "max_price" in params:
+            filters["max_price"] = self.parse_int(params, "max_price")
+        return filters
+
+    @staticmethod
+    def parse_bool(params, name):
+        value = params[name].lower()
+        if value in TRUE_VALUES:
+            return True
+        if value in FALSE_VALUES:
+            return False
+        raise ValidationError({name: "Expected true or false."})
+
+    @staticmethod
+    def parse_int(params, name):
+        try:
+            return int(params[name])
+        except ValueError:
+            raise ValidationError({name: "Expected a whole number."})
+
+
+# =========================
+# FACET COUNTS
+# =========================
+
+FACET_SQL = """
+WITH p AS ({products})
+SELECT 'color', COALESCE(c ->> 'name', c #>> '{{}}'), COUNT(*)
+  FROM p, jsonb_array_elements(
+      CASE WHEN jsonb_typeof(p.available_colors) = 'array'
+           THEN p.available_colors ELSE '[]'::jsonb END
+  ) AS c
+ GROUP BY 2
+UNION ALL
+SELECT 'material', m, COUNT(*)
+  FROM p, jsonb_array_elements_text(
+      CASE WHEN jsonb_typeof(p.materials) = 'array'
+           THEN p.materials ELSE '[]'::jsonb END
+  ) AS m
+ GROUP BY 2
+UNION ALL
+SELECT 'flag', 'food_safe', COUNT(*) FILTER (WHERE p.is_food_safe) FROM p
+UNION ALL
+SELECT 'flag', 'microwave_safe', COUNT(*) FILTER (WHERE p.is_microwave_safe) FROM p
+UNION ALL
+SELECT 'flag', 'dishwasher_safe', COUNT(*) FILTER (WHERE p.is_dishwasher_safe) FROM p
+UNION ALL
+SELECT 'price', 'min', MIN(p.price)::bigint FROM p
+UNION ALL
+SELECT 'price', 'max', MAX(p.price)::bigint FROM p
+UNION ALL
+SELECT 'total', '', COUNT(*) FROM p
+"""
+
+
+def facet_counts(queryset):
+    """
+    Colour / material / flag counts and the price range for the given
+    (already filtered) queryset, in one round trip.
+    """
+    if not queryset.query.is_sliced:
+        queryset = queryset.order_by()
+
+    products = queryset.values(
+        "available_colors",
+        "materials",
+        "is_food_safe",
+        "is_microwave_safe",
+        "is_dishwasher_safe",
+        "price",
+    )
+    sql, params = products.query.sql_with_params()
+
+    facets = {
+        "total": 0,
+        "colors": {},
+        "materials": {},
+        "flags": {},
+        "price": {"min": None, "max": None},
+    }
+
+    with connection.cursor() as cursor:
+        cursor.execute(FACET_SQL.format(products=sql), params)
+        for facet, value, count in cursor.fetchall():
+            if facet == "color":
+                facets["colors"][value] = count
+            elif facet == "material":
+                facets["materials"][value] = count
+            elif facet == "flag":
+                facets["flags"][value] = count
+            elif facet == "price":
+                facets["price"][value] = count
+            else:
+                facets["total"] = count
+
+    return facets
@@ -0,0 +1,117 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import InventoryMovement, InventorySnapshot, Product
+
+
+# Lower bound for products that have no snapshot yet
+BEGINNING = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def record_movements(movements):
+    """Bulk-insert ledger rows, skipping no-op ones. `movements` are unsaved."""
+    movements = [m for m in movements if m.stock_delta or m.held_delta]
+    if movements:
+        InventoryMovement.objects.bulk_create(movements)
+    return movements
+
+
+def movement(product_id, kind, stock_delta=0, held_delta=0, reference=""):
+    return InventoryMovement(
+        product_id=product_id,
+        kind=kind,
+        stock_delta=stock_delta,
+        held_delta=held_delta,
+        reference=reference,
+    )
+
+
+# =========================
+# POINT-IN-TIME QUERIES
+# =========================
+
+def _latest_snapshot(product, at):
+    return InventorySnapshot.objects.filter(
+        product=product, taken_at__lte=at
+    ).order_by("-taken_at")
+
+
+def stock_at(product_id, at=None):
+    """
+    {"stock": .., "held": ..} for one product at `at` (default: now).
+
+    One query: the latest snapshot at or before `at` plus the movements
+    after it, both read through their (product, time) indexes.
+    """
+    at = at or timezone.now()
+    snapshot = _latest_snapshot(product_id, at)[:1]
+
+    return InventoryMovement.objects.filter(
+        product_id=product_id,
+        created_at__lte=at,
+        created_at__gt=Coalesce(Subquery(snapshot.values("taken_at")), Value(BEGINNING)),
+    ).aggregate(
+        stock=Coalesce(Subquery(snapshot.values("stock")), 0)
+        + Coalesce(Sum("stock_delta"), 0),
+        held=Coalesce(Subquery(snapshot.values("held")), 0)
+        + Coalesce(Sum("held_delta"), 0),
+    )
+
+
+def ledger_totals(at):
+    """
+    ({product_id: (stock, held)} at `at` for every product in the ledger,
+    set of product ids with movements since their latest snapshot).
+    """
+    latest = (
+        InventorySnapshot.objects.filter(taken_at__lte=at)
+        .order_by("product_id", "-taken_at")
+        .distinct("product_id")
+    )
+    totals = {s.product_id: (s.stock, s.held) for s in latest}
+
+    since = _latest_snapshot(OuterRef("product"), at).values("taken_at")[:1]
+    moved = (
+        InventoryMovement.objects.filter(
+            created_at__lte=at,
+            created_at__gt=Coalesce(Subquery(since), Value(BEGINNING)),
+        )
+        .values("product_id")
+        .annotate(stock=Sum("stock_delta"), held=Sum("held_delta"))
+    )
+
+    changed = set()
+    for row in moved:
+        stock, held = totals.get(row["product_id"], (0, 0))
+        totals[row["product_id"]] = (stock + row["stock"], held + row["held"])
+        changed.add(row["product_id"])
+
+    return totals, changed
+
+
+def take_snapshots(cutoff):
+    """Snapshot every product whose ledger moved since its last snapshot."""
+    totals, changed = ledger_totals(cutoff)
+    InventorySnapshot.objects.bulk_create([
+        InventorySnapshot(
+            product_id=product_id,
+            stock=totals[product_id][0],
+            held=totals[product_id][1],
+            taken_at=cutoff,
+        )
+        for product_id in changed
+    ])
+    return len(changed)
+
+
+def stock_drift():
+    """{product_id: Product.stock - ledger stock} where they disagree."""
+    totals, _ = ledger_totals(timezone.now())
+    return {
+        product_id: stock - totals.get(product_id, (0, 0))[0]
+        for product_id, stock in Product.objects.values_list("id", "stock")
+        if stock != totals.get(product_id, (0, 0))[0]
+    }
@@ -0,0 +1,127 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from apps.products.columnar import get_columnar_catalog
+from apps.products.models import Category, Product
+from apps.products.views import (
+    FeaturedProductListView,
+    ProductByCategoryView,
+    ProductListView,
+    ProductProjectionMixin,
+)
+
+from .bench_product_encoder import synthetic_products
+
+
+def scenarios(slug):
+    return [
+        ("all products", ProductListView, {}, {}),
+        ("first page, newest", ProductListView, {}, {"page_size": 24}),
+        ("first page, price_asc", ProductListView, {}, {"sort": "price_asc", "page_size": 24}),
+        (
+            "filtered page",
+            ProductListView, {},
+            {"food_safe": "true", "max_price": 3000, "sort": "price_desc", "page_size": 24},
+        ),
+        ("sparse fields", ProductListView, {}, {"fields": "id,name,price", "page_size": 100}),
+        ("category page", ProductByCategoryView, {"slug": slug}, {"sort": "featured", "page_size": 24}),
+        ("featured", FeaturedProductListView, {}, {}),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Compare the ORM listing path with the in-memory columnar catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--synthetic", type=int, default=0,
+            help="Benchmark N generated products (rolled back afterwards)",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options["synthetic"]:
+                self.create_synthetic(options["synthetic"])
+
+            self.run(options["repeat"])
+            transaction.set_rollback(True)
+
+    def create_synthetic(self, count):
+        categories = [
+            Category.objects.create(name=f"Bench {name}", slug=f"bench-{name}")
+            for name in ("tableware", "decor", "custom")
+        ]
+        Product.objects.bulk_create(
+            synthetic_products(count, categories), batch_size=1000
+        )
+
+    def run(self, repeat):
+        category = Category.objects.filter(products__isnull=False).first()
+        if category is None:
+            raise CommandError("No products to benchmark (try --synthetic 10000)")
+
+        # Build time is paid once per catalog version, not per request
+        start = time.perf_counter()
+        catalog = get_columnar_catalog()
+        build_time = time.perf_counter() - start
+
+        self.stdout.write(
+            f"{catalog.size} products, snapshot built in {build_time * 1000:.1f} ms, "
+            f"best of {repeat} runs"
+        )
+        self.stdout.write(f"  {'scenario':24} {'ORM':>10} {'columnar':>10} {'speedup':>8}")
+
+        for name, view_class, kwargs, params in scenarios(category.slug):
+            orm_data = self.list(view_class, kwargs, params, columnar=False)
+            columnar_data = self.list(view_class, kwargs, params, columnar=True)
+
+            if self.normalise(orm_data) != self.normalise(columnar_data):
+                raise CommandError(f"{name}: columnar output differs from the ORM")
+
+            orm_time = self.best_of(
+                repeat, lambda: self.list(view_class, kwargs, params, columnar=False)
+            )
+            columnar_time = self.best_of(
+                repeat, lambda: self.list(view_class, kwargs, params, columnar=True)
+            )
+
+            self.stdout.write(
+                f"  {name:24} {orm_time * 1000:8.2f}ms {columnar_time * 1000:8.2f}ms "
+                f"{orm_time / columnar_time:7.1f}x"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Outputs match on every scenario"))
+
+    @staticmethod
+    def list(view_class, kwargs, params, columnar):
+        request = APIRequestFactory().get("/api/products/", params)
+
+        with override_settings(PRODUCTS_COLUMNAR_CATALOG=columnar):
+            view = view_class()
+            view.setup(request, **kwargs)
+            view.format_kwarg = None
+            view.request = view.initialize_request(request)
+            # Skips CatalogCacheMixin so both paths do the real work
+            return ProductProjectionMixin.list(view, view.request).data
+
+    @staticmethod
+    def normalise(data):
+        # Unpaginated lists have no defined order in SQL
+        if isinstance(data, list):
+            data = sorted(data, key=lambda item: item["id"])
+        return json.dumps(data, sort_keys=True, default=str)
+
+    @staticmethod
+    def best_of(repeat, fn):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,95 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.products.encoders import ProductRowEncoder
+from apps.products.models import Category, Product
+from apps.products.serializers import ProductSerializer
+
+
+def synthetic_products(count, categories=None):
+    if categories is None:
+        categories = [
+            Category(id=i, name=name, slug=name)
+            for i, name in enumerate(("tableware", "decor", "custom"), start=1)
+        ]
+
+    for i in range(count):
+        yield Product(
+            id=f"bench-product-{i:05d}",
+            name=f"Bench Tea Bowl {i}",
+            category=categories[i % len(categories)],
+            description="Handcrafted stoneware bowl.",
+            long_description=None if i % 4 == 0 else "Thrown on the wheel. " * 20,
+            price=500 + (i % 200) * 25,
+            stock=i % 30,
+            weight=0.25 + (i % 10) / 10,
+            featured=i % 7 == 0,
+            is_customizable=i % 3 == 0,
+            images=[f"/Images/products/{i % 15}.png"] * 3,
+            available_colors=[
+                {"name": "Earth Brown", "code": "#8B6F47"},
+                {"name": "Matte White", "code": "#F5F5DC"},
+            ],
+            features=["Handcrafted", "Unique glaze"],
+            materials=["Stoneware clay", "Food-safe glaze"],
+            care_instructions=["Hand wash", "Pat dry"],
+            dimensions={"diameter": "12cm", "height": "7cm"} if i % 2 else None,
+            related_products=[f"bench-product-{(i + 1) % count:05d}"],
+            is_food_safe=True,
+            is_microwave_safe=i % 2 == 0,
+            is_dishwasher_safe=i % 5 == 0,
+        )
+
+
+def as_row(product, paths):
+    # Mimics a values_list() row without touching the database
+    row = []
+    for path in paths:
+        value = product
+        for part in path.split("__"):
+            value = getattr(value, part)
+        row.append(value)
+    return tuple(row)
+
+
+class Command(BaseCommand):
+    help = "Compare ProductSerializer with ProductRowEncoder on synthetic products"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        count, repeat = options["count"], options["repeat"]
+
+        products = list(synthetic_products(count))
+        encoder = ProductRowEncoder(extra=())
+        rows = [as_row(p, encoder.paths) for p in products]
+
+        serializer_data = ProductSerializer(products, many=True).data
+        encoder_data = encoder.encode(rows)
+        if json.dumps(serializer_data) != json.dumps(encoder_data):
+            raise CommandError("Encoder output differs from ProductSerializer")
+
+        serializer_time = self.best_of(
+            repeat, lambda: ProductSerializer(products, many=True).data
+        )
+        encoder_time = self.best_of(repeat, lambda: encoder.encode(rows))
+
+        self.stdout.write(f"{count} products, best of {repeat} runs")
+        self.stdout.write(f"  ProductSerializer : {serializer_time * 1000:8.1f} ms")
+        self.stdout.write(f"  ProductRowEncoder : {encoder_time * 1000:8.1f} ms")
+        self.stdout.write(self.style.SUCCESS(
+            f"  speedup           : {serializer_time / encoder_time:8.1f}x"
+        ))
+
+    @staticmethod
+    def best_of(repeat, fn):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
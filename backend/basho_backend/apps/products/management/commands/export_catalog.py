@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.export import export_catalog
+
+
+class Command(BaseCommand):
+    help = "Write the catalog, featured and per-category JSON exports (gzip + brotli)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--category",
+            action="append",
+            dest="categories",
+            help="Only rebuild these category slugs (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        manifest = export_catalog(options["categories"])
+
+        for name, url in sorted(manifest.items()):
+            self.stdout.write(f"  {name:<30} {url}")
+        self.stdout.write(self.style.SUCCESS(f"Exported {len(manifest)} files"))
@@ -0,0 +1,42 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.products.bulk import FORMATS, export_rows, write_records
+from apps.products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Stream every product to CSV or JSONL (the import_products format)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--output", default="-", help="File to write, or - for stdout")
+        parser.add_argument(
+            "--category",
+            action="append",
+            dest="categories",
+            help="Only export these category slugs (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        queryset = Product.objects.all()
+        if options["categories"]:
+            queryset = queryset.filter(category__slug__in=options["categories"])
+
+        start = time.perf_counter()
+        rows = export_rows(queryset)
+
+        if options["output"] == "-":
+            count = write_records(sys.stdout, options["format"], rows)
+        else:
+            with open(options["output"], "w", encoding="utf-8", newline="") as fh:
+                count = write_records(fh, options["format"], rows)
+
+        elapsed = time.perf_counter() - start
+        # stderr, so stdout can be piped straight into a file
+        self.stderr.write(self.style.SUCCESS(
+            f"Exported {count} products in {elapsed:.1f}s "
+            f"({count / max(elapsed, 1e-9):,.0f} rows/s)"
+        ))
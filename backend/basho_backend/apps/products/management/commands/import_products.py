@@ -0,0 +1,128 @@
+import itertools
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.products.bulk import (
+    FORMATS,
+    ProductRowParser,
+    RowError,
+    check_columns,
+    detect_format,
+    missing_columns,
+    read_records,
+    upsert_batch,
+)
+from apps.products.cache import bump_catalog_version
+from apps.products.export import export_catalog
+from apps.products.models import Product
+from apps.products.suggest import SUGGEST_KEY
+
+
+class Command(BaseCommand):
+    help = "Upsert products from a CSV or JSONL file (streamed, in batches)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, or - for stdin")
+        parser.add_argument("--format", choices=FORMATS)
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            fmt = detect_format(path, options["format"])
+        except ValueError as e:
+            raise CommandError(e)
+
+        if path == "-":
+            self.run(sys.stdin, fmt, options["batch_size"])
+        else:
+            with open(path, encoding="utf-8-sig", newline="") as fh:
+                self.run(fh, fmt, options["batch_size"])
+
+    def run(self, fh, fmt, batch_size):
+        records = read_records(fh, fmt)
+
+        first = next(records, None)
+        if first is None:
+            raise CommandError("Nothing to import")
+        if not isinstance(first[1], dict):
+            raise CommandError(f"line {first[0]}: not a JSON object")
+
+        # The first record fixes the columns; only those are updated on
+        # existing products
+        columns = [c for c in first[1] if c is not None]
+        try:
+            check_columns(columns)
+        except ValueError as e:
+            raise CommandError(e)
+
+        missing = missing_columns(columns)
+        if missing:
+            self.stdout.write(
+                f"No {', '.join(missing)} column(s): updating existing products only"
+            )
+
+        self.columns, self.missing = columns, missing
+        self.errors, self.slugs = [], set()
+
+        parser = ProductRowParser(columns, text_cells=fmt == "csv")
+        start = time.perf_counter()
+        imported, batch, lines = 0, [], {}
+
+        for line_no, record in itertools.chain([first], records):
+            try:
+                product = parser.parse(record)
+            except RowError as e:
+                self.errors.append(f"line {line_no}: {e}")
+                continue
+
+            batch.append(product)
+            lines[product.id] = line_no
+            if "category" in columns:
+                self.slugs.add(record["category"])
+
+            if len(batch) >= batch_size:
+                imported += self.write(batch, lines)
+                batch, lines = [], {}
+                self.report(imported, start)
+
+        if batch:
+            imported += self.write(batch, lines)
+            self.report(imported, start)
+
+        # bulk_create skips the signals that keep these up to date. The
+        # export runs here rather than in a background thread, which
+        # would die with this process
+        bump_catalog_version(SUGGEST_KEY)
+        export_catalog(sorted(self.slugs))
+
+        for error in self.errors[:20]:
+            self.stderr.write(f"  skipped {error}")
+        if len(self.errors) > 20:
+            self.stderr.write(f"  ... and {len(self.errors) - 20} more")
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} products in {elapsed:.1f}s "
+            f"({imported / elapsed:,.0f} rows/s), {len(self.errors)} skipped"
+        ))
+
+    def write(self, batch, lines):
+        written = upsert_batch(batch, self.columns)
+
+        for product_id in set(lines) - set(written):
+            self.errors.append(
+                f"line {lines[product_id]}: no product {product_id!r} to update "
+                f"(new products need {', '.join(self.missing)})"
+            )
+        if "category" not in self.columns:
+            self.slugs.update(
+                Product.objects.filter(id__in=written).values_list("category__slug", flat=True)
+            )
+        return len(written)
+
+    def report(self, imported, start):
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"  {imported} rows, {imported / elapsed:,.0f} rows/s")
@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.products.inventory import movement, record_movements, stock_drift, take_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshot the inventory ledger for products that moved since their "
+        "last snapshot, and check it against Product.stock"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lag",
+            type=int,
+            default=5,
+            help="Minutes behind now to snapshot, so slow transactions have committed",
+        )
+        parser.add_argument(
+            "--reconcile",
+            action="store_true",
+            help="Record an adjustment for every product whose ledger disagrees",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options["lag"])
+
+        with transaction.atomic():
+            taken = take_snapshots(cutoff)
+        self.stdout.write(self.style.SUCCESS(f"📒 {taken} snapshots at {cutoff:%Y-%m-%d %H:%M:%S}"))
+
+        drift = stock_drift()
+        for product_id, delta in sorted(drift.items()):
+            self.stdout.write(self.style.WARNING(f"⚠️ {product_id}: stock is {delta:+d} vs ledger"))
+
+        if drift and options["reconcile"]:
+            record_movements(
+                movement(product_id, "adjustment", stock_delta=delta, reference="reconcile")
+                for product_id, delta in drift.items()
+            )
+            self.stdout.write(self.style.SUCCESS(f"Reconciled {len(drift)} products"))
@@ -0,0 +1,60 @@
+import os
+import re
+
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.responders import IsDirectoryError, MissingFileError
+
+from .export import EXPORT_SUBDIR
+
+
+HASHED_EXPORT = re.compile(r"\.[0-9a-f]{12}\.json$")
+
+
+class CatalogWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise indexes STATIC_ROOT once at startup (unless autorefresh is
+    on), so catalog exports written later by the admin save hook would
+    404. Exported files are content-hashed and never change, so they are
+    looked up on first request and remembered until they are pruned.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.catalog_files = {}
+        super().__init__(*args, **kwargs)
+
+    @property
+    def catalog_prefix(self):
+        return f"{self.static_prefix}{EXPORT_SUBDIR}/"
+
+    def __call__(self, request):
+        path = request.path_info
+
+        if not self.autorefresh and path.startswith(self.catalog_prefix):
+            static_file = self.catalog_files.get(path)
+
+            if static_file is None or not os.path.isfile(self.catalog_path(path)):
+                self.catalog_files.pop(path, None)
+                static_file = self.find_catalog_file(path)
+                if static_file is not None and HASHED_EXPORT.search(path):
+                    self.catalog_files[path] = static_file
+
+            if static_file is not None:
+                return self.serve(static_file, request)
+
+        return super().__call__(request)
+
+    def catalog_path(self, path):
+        return os.path.join(self.static_root, path[len(self.static_prefix):])
+
+    def find_catalog_file(self, path):
+        if not self.url_is_canonical(path):
+            return None
+        try:
+            return self.find_file_at_path(self.catalog_path(path), path)
+        except (MissingFileError, IsDirectoryError):
+            return None
+
+    def immutable_file_test(self, path, url):
+        if url.startswith(self.catalog_prefix):
+            return bool(HASHED_EXPORT.search(url))
+        return super().immutable_file_test(path, url)
@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-18 16:34
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['available_colors'], name='product_colors_gin_idx', opclasses=['jsonb_path_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['materials'], name='product_materials_gin_idx', opclasses=['jsonb_path_ops']),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 16:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_product_facet_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['id'], include=('stock', 'price'), name='product_stock_cover_idx'),
+        ),
+    ]
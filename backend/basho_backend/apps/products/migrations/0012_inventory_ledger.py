@@ -0,0 +1,72 @@
+# Generated by Django 6.0 on 2026-10-18 17:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def open_ledger(apps, schema_editor):
+    """One opening movement per product, plus the holds already live."""
+    Product = apps.get_model("products", "Product")
+    InventoryMovement = apps.get_model("products", "InventoryMovement")
+    StockHold = apps.get_model("orders", "StockHold")
+
+    InventoryMovement.objects.bulk_create(
+        (
+            InventoryMovement(product_id=pk, kind="opening", stock_delta=stock)
+            for pk, stock in Product.objects.filter(stock__gt=0).values_list("pk", "stock").iterator()
+        ),
+        batch_size=2000,
+    )
+    InventoryMovement.objects.bulk_create(
+        (
+            InventoryMovement(
+                product_id=hold.product_id,
+                kind="hold",
+                held_delta=hold.quantity,
+                reference=f"payment_order:{hold.payment_order_id}",
+            )
+            for hold in StockHold.objects.filter(status="active").iterator()
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_product_stock_cover_index'),
+        ('orders', '0003_stockhold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('opening', 'Opening balance'), ('sale', 'Sale'), ('restock', 'Restock'), ('adjustment', 'Adjustment'), ('hold', 'Checkout hold'), ('release', 'Hold released')], max_length=20)),
+                ('stock_delta', models.IntegerField(default=0)),
+                ('held_delta', models.IntegerField(default=0)),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_movements', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'created_at'], name='inventory_movement_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.IntegerField()),
+                ('held', models.IntegerField()),
+                ('taken_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_snapshots', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-taken_at'], name='inventory_snapshot_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
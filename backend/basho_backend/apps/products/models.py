@@ -1,5 +1,8 @@
  # Create your models here.
 from django.db import models
+from django.utils import timezone
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 import uuid
 from cloudinary.models import CloudinaryField
 class Category(models.Model):
@@ -48,9 +51,127 @@ class Product(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Weighted full-text document, maintained by signals.update_search_vector
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        # One composite index per listing sort mode (see pagination.py),
+        # plus category-prefixed copies for the category pages
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="product_newest_idx"),
+            models.Index(fields=["price", "id"], name="product_price_idx"),
+            models.Index(
+                fields=["-featured", "-created_at", "-id"],
+                name="product_featured_idx",
+            ),
+            models.Index(
+                fields=["category", "-created_at", "-id"],
+                name="product_cat_newest_idx",
+            ),
+            models.Index(
+                fields=["category", "price", "id"],
+                name="product_cat_price_idx",
+            ),
+            models.Index(
+                fields=["category", "-featured", "-created_at", "-id"],
+                name="product_cat_featured_idx",
+            ),
+            GinIndex(fields=["search_vector"], name="product_search_idx"),
+            # Index-only scans for the stock/availability endpoint
+            models.Index(
+                fields=["id"],
+                include=["stock", "price"],
+                name="product_stock_cover_idx",
+            ),
+            # jsonb @> lookups used by the colour / material facets
+            GinIndex(
+                fields=["available_colors"],
+                opclasses=["jsonb_path_ops"],
+                name="product_colors_gin_idx",
+            ),
+            GinIndex(
+                fields=["materials"],
+                opclasses=["jsonb_path_ops"],
+                name="product_materials_gin_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
+
+class CatalogVersion(models.Model):
+    """
+    Monotonic counter bumped whenever the public catalog changes.
+    Kept in the database so every worker sees the same version.
+    """
+    key = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key} v{self.version}"
+
+
+class InventoryMovement(models.Model):
+    """
+    Append-only stock ledger. Product.stock is the sum of stock_delta and
+    the units held by live checkouts the sum of held_delta, from the
+    product's opening movement onwards.
+    """
+
+    KIND_CHOICES = (
+        ("opening", "Opening balance"),
+        ("sale", "Sale"),
+        ("restock", "Restock"),
+        ("adjustment", "Adjustment"),
+        ("hold", "Checkout hold"),
+        ("release", "Hold released"),
+    )
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="inventory_movements"
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    stock_delta = models.IntegerField(default=0)
+    held_delta = models.IntegerField(default=0)
+    reference = models.CharField(max_length=100, blank=True)  # e.g. payment_order:42
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["product", "created_at"], name="inventory_movement_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.stock_delta:+d} {self.product_id}"
+
+
+class InventorySnapshot(models.Model):
+    """Ledger totals for one product at `taken_at` (see inventory.py)."""
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="inventory_snapshots"
+    )
+    stock = models.IntegerField()
+    held = models.IntegerField()
+    taken_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["product", "-taken_at"], name="inventory_snapshot_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.taken_at}: {self.stock}"
+
 class CustomOrder(models.Model):
     PRODUCT_TYPE_CHOICES = [
         ("cups_mugs", "Cups & Mugs"),
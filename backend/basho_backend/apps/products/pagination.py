@@ -0,0 +1,220 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class ProductKeysetPagination(BasePagination):
+    """
+    Forward-only keyset (cursor) pagination for product listings.
+
+    The cursor holds the sort key of the last row on the page, so the next
+    page is an index range scan starting right after it – page 50 costs
+    the same as page 1. Every ordering ends in the primary key to keep it
+    unique, and all columns of an ordering run in the same direction so a
+    single composite index (see Product.Meta.indexes) can serve it.
+
+    Pagination is opt-in: requests without ?cursor, ?page_size or ?sort
+    keep receiving the plain list the frontend already expects.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    sort_query_param = "sort"
+
+    page_size = 24
+    max_page_size = 100
+    default_sort = "newest"
+
+    SORT_ORDERINGS = {
+        "newest": ("-created_at", "-id"),
+        "price_asc": ("price", "id"),
+        "price_desc": ("-price", "-id"),
+        "featured": ("-featured", "-created_at", "-id"),
+    }
+
+    # Cursors come from clients: anything that doesn't fit its column
+    # would otherwise only fail inside the ORM / database
+    CURSOR_TYPES = {"id": str, "price": int, "featured": bool}
+    MAX_CURSOR_PRICE = 2 ** 31 - 1
+
+    def is_requested(self, request):
+        params = (
+            self.cursor_query_param,
+            self.page_size_query_param,
+            self.sort_query_param,
+        )
+        return any(p in request.query_params for p in params)
+
+    def setup(self, request):
+        self.request = request
+        self.sort = self.get_sort(request)
+        self.ordering = self.SORT_ORDERINGS[self.sort]
+        self.limit = self.get_page_size(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        self.setup(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.after_position(position))
+
+        # Fetch one extra row to know whether there is a next page
+        rows = list(queryset[: self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        rows = rows[: self.limit]
+
+        self.next_position = (
+            [self.row_value(rows[-1], field) for field in self.ordering]
+            if self.has_next
+            else None
+        )
+        return rows
+
+    def paginate_catalog(self, catalog, mask, request):
+        """
+        Same pages and cursors as paginate_queryset(), served from a
+        ColumnarCatalog snapshot. Returns row indexes into the snapshot.
+        """
+        if not self.is_requested(request):
+            return None
+
+        self.setup(request)
+        hits = catalog.select(
+            mask, self.ordering, self.decode_cursor(request), self.limit + 1
+        )
+        self.has_next = len(hits) > self.limit
+        hits = hits[: self.limit]
+
+        self.next_position = (
+            catalog.position(hits[-1], self.ordering) if self.has_next else None
+        )
+        return hits
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "sort": self.sort,
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "sort": {"type": "string", "enum": list(self.SORT_ORDERINGS)},
+                "results": schema,
+            },
+        }
+
+    # ------------------------
+    # PARAMS
+    # ------------------------
+
+    def get_sort(self, request):
+        sort = request.query_params.get(self.sort_query_param, self.default_sort)
+        if sort not in self.SORT_ORDERINGS:
+            raise ValidationError({
+                self.sort_query_param: f"Choose one of: {', '.join(self.SORT_ORDERINGS)}."
+            })
+        return sort
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    # ------------------------
+    # KEYSET FILTER
+    # ------------------------
+
+    @staticmethod
+    def row_value(row, field):
+        name = field.lstrip("-")
+        return row[name] if isinstance(row, dict) else getattr(row, name)
+
+    def after_position(self, position):
+        """
+        Row-value comparison (a, b, c) > (x, y, z) spelled out as
+        a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z),
+        with a leading a >= x so Postgres starts an index range scan.
+        """
+        fields = [f.lstrip("-") for f in self.ordering]
+        op = "lt" if self.ordering[0].startswith("-") else "gt"
+        op_eq = "lte" if op == "lt" else "gte"
+
+        condition = Q()
+        for i, field in enumerate(fields):
+            term = Q(**{f"{field}__{op}": position[i]})
+            for prev in range(i):
+                term &= Q(**{fields[prev]: position[prev]})
+            condition |= term
+
+        return Q(**{f"{fields[0]}__{op_eq}": position[0]}) & condition
+
+    # ------------------------
+    # CURSOR ENCODING
+    # ------------------------
+
+    def encode_cursor(self, position):
+        values = [
+            v.isoformat() if isinstance(v, datetime) else v for v in position
+        ]
+        payload = json.dumps([self.sort, values], separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            sort, values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if sort != self.sort or not isinstance(values, list):
+                raise ValueError
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                self.cursor_value(f.lstrip("-"), v)
+                for f, v in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound("Invalid cursor")
+
+    def cursor_value(self, field, value):
+        if field == "created_at":
+            value = datetime.fromisoformat(value)
+            if value.tzinfo is None:
+                raise ValueError
+            return value
+
+        # type(), not isinstance(): True is an int, 1 is not a bool
+        if type(value) is not self.CURSOR_TYPES[field]:
+            raise ValueError
+        if field == "price" and not 0 <= value <= self.MAX_CURSOR_PRICE:
+            raise ValueError
+        return value
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
@@ -0,0 +1,36 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db.models import TextField
+from django.db.models.functions import Cast
+
+
+SEARCH_CONFIG = "english"
+
+# name > description > long description > materials
+PRODUCT_SEARCH_VECTOR = (
+    SearchVector("name", weight="A", config=SEARCH_CONFIG)
+    + SearchVector("description", weight="B", config=SEARCH_CONFIG)
+    + SearchVector("long_description", weight="C", config=SEARCH_CONFIG)
+    + SearchVector(
+        Cast("materials", output_field=TextField()),
+        weight="D",
+        config=SEARCH_CONFIG,
+    )
+)
+
+
+def prefix_search_query(text):
+    """
+    "tea bo" -> to_tsquery('tea:* & bo:*'), so partial words match while
+    the user is still typing. Only word characters reach the raw query.
+    """
+    terms = re.findall(r"\w+", text or "")
+    if not terms:
+        return None
+
+    return SearchQuery(
+        " & ".join(f"{term}:*" for term in terms),
+        search_type="raw",
+        config=SEARCH_CONFIG,
+    )
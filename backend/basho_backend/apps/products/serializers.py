@@ -7,6 +7,8 @@ from django.urls import reverse
 
 
 class ProductSerializer(serializers.ModelSerializer):
+    # No stock: it changes with every sale, and this payload is cached per
+    # catalog version. Clients read it from ProductAvailabilityView.
     # Category slug for frontend
     category = serializers.CharField(source="category.slug", read_only=True)
 
@@ -63,12 +65,49 @@ class ProductSerializer(serializers.ModelSerializer):
             "isMicrowaveSafe",
             "isDishwasherSafe",
             "isCustomizable",
-            "stock",
             "weight",
             "featured",
             "relatedProducts",
         ]
 
+    def __init__(self, *args, **kwargs):
+        # Optional sparse fieldset, e.g. ProductSerializer(qs, fields=["id", "name"])
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def model_fields_for(cls, names):
+        """Map API field names (camelCase) to ORM paths usable with .only()."""
+        declared = cls._declared_fields
+        paths = []
+        for name in names:
+            field = declared.get(name)
+            source = field.source if field is not None and field.source else name
+            paths.append(source.replace(".", "__"))
+        return paths
+
+
+class ProductCardSerializer(serializers.ModelSerializer):
+    """Compact projection for grid pages."""
+    category = serializers.CharField(source="category.slug", read_only=True)
+
+    # First entry of Product.images, annotated by the view
+    image = serializers.CharField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = Product
+        fields = [
+            "id",
+            "name",
+            "category",
+            "price",
+            "image",
+        ]
+
 class CustomOrderImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomOrderImage
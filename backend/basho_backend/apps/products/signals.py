@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.experiences.models import Experience, Workshop
+
+from .cache import bump_catalog_version
+from .inventory import movement, record_movements
+from .models import Category, Product
+from .search import PRODUCT_SEARCH_VECTOR
+from .suggest import apply_suggest_change
+
+
+# Volatile fields served by the availability endpoint; saving only these
+# must not invalidate the cached product content
+VOLATILE_FIELDS = {"stock"}
+
+
+def is_volatile_save(update_fields):
+    return bool(update_fields) and set(update_fields) <= VOLATILE_FIELDS
+
+
+# =========================
+# CATALOG VERSION
+# =========================
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog(sender, update_fields=None, **kwargs):
+    if is_volatile_save(update_fields):
+        return
+    bump_catalog_version()
+
+
+# =========================
+# FULL-TEXT SEARCH
+# =========================
+
+@receiver(post_save, sender=Product)
+def update_search_vector(sender, instance, update_fields=None, **kwargs):
+    if is_volatile_save(update_fields):
+        return
+
+    # update() skips signals, so this does not recurse
+    Product.objects.filter(pk=instance.pk).update(
+        search_vector=PRODUCT_SEARCH_VECTOR
+    )
+
+
+# =========================
+# INVENTORY LEDGER
+# =========================
+
+@receiver(post_save, sender=Product)
+def record_opening_stock(sender, instance, created=False, raw=False, **kwargs):
+    # Later stock changes are recorded where they happen (admin, import,
+    # checkout); bulk_create in the importer records its own openings
+    if created and not raw:
+        record_movements([movement(instance.pk, "opening", stock_delta=instance.stock)])
+
+
+# =========================
+# AUTOCOMPLETE
+# =========================
+
+SUGGEST_KINDS = {
+    Product: "product",
+    Category: "category",
+    Workshop: "workshop",
+    Experience: "experience",
+}
+
+
+def schedule_suggest_change(sender, instance, deleted):
+    kind, pk = SUGGEST_KINDS[sender], instance.pk
+
+    def run():
+        try:
+            apply_suggest_change(kind, pk, deleted=deleted)
+        except Exception as e:
+            print("❌ Suggest index update failed:", kind, pk, e)
+
+    transaction.on_commit(run)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Workshop)
+@receiver(post_save, sender=Experience)
+def update_suggest_index(sender, instance, update_fields=None, **kwargs):
+    if sender is Product and is_volatile_save(update_fields):
+        return
+    schedule_suggest_change(sender, instance, deleted=False)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Workshop)
+@receiver(post_delete, sender=Experience)
+def remove_from_suggest_index(sender, instance, **kwargs):
+    schedule_suggest_change(sender, instance, deleted=True)
@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key inside this process: the
+    first caller runs `fn`, everyone else waits for and shares its result
+    (or its exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.value
+
+
+_flight = SingleFlight()
+
+
+def cached_single_flight(key, version, compute, soft_ttl=60, hard_ttl=60 * 60,
+                         lock_ttl=10, wait=2.0):
+    """
+    Read-through cache in front of `compute()`.
+
+    - Fresh entry: returned straight from the cache.
+    - Past `soft_ttl` but same `version`: returned as is while one
+      background thread recomputes it, so hot keys never go cold.
+    - Missing or older `version`: one caller recomputes; callers in this
+      process wait on it (SingleFlight) and callers in other processes
+      wait on a cache lock, polling for the result for up to `wait`
+      seconds before computing themselves.
+
+    The cross-process part needs a shared cache (settings.REDIS_URL).
+    With the default per-process LocMemCache each worker coalesces only
+    its own requests.
+    """
+    entry = cache.get(key)
+
+    if entry is not None and entry["version"] == version:
+        if time.time() >= entry["refresh_at"] and cache.add(f"{key}:lock", 1, lock_ttl):
+            threading.Thread(
+                target=_refresh,
+                args=(key, version, compute, soft_ttl, hard_ttl),
+                daemon=True,
+            ).start()
+        return entry["value"]
+
+    return _flight.do(
+        key, lambda: _fill(key, version, compute, soft_ttl, hard_ttl, lock_ttl, wait)
+    )
+
+
+def _store(key, version, value, soft_ttl, hard_ttl):
+    cache.set(
+        key,
+        {
+            "version": version,
+            "value": value,
+            # Wall clock: the entry may be read by other processes
+            "refresh_at": time.time() + soft_ttl,
+        },
+        hard_ttl,
+    )
+
+
+def _fill(key, version, compute, soft_ttl, hard_ttl, lock_ttl, wait):
+    lock_key = f"{key}:lock"
+    locked = cache.add(lock_key, 1, lock_ttl)
+
+    if not locked:
+        # Another process is computing it – give it a moment
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None and entry["version"] == version:
+                return entry["value"]
+
+    try:
+        value = compute()
+        _store(key, version, value, soft_ttl, hard_ttl)
+        return value
+    finally:
+        # A waiter that timed out never held the lock – leave the holder's
+        if locked:
+            cache.delete(lock_key)
+
+
+def _refresh(key, version, compute, soft_ttl, hard_ttl):
+    try:
+        _store(key, version, compute(), soft_ttl, hard_ttl)
+    except Exception:
+        logger.exception("Background refresh failed for %s", key)
+    finally:
+        cache.delete(f"{key}:lock")
+        connections.close_all()
@@ -0,0 +1,294 @@
+import logging
+import threading
+import time
+import unicodedata
+
+from django.db import connections
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+from apps.experiences.models import Experience, Workshop
+
+from .cache import bump_catalog_version, get_catalog_version
+from .models import Category, Product
+
+
+SUGGEST_KEY = "suggest"
+
+# Suggestions kept per trie node – the most a lookup can return
+TOP_K = 10
+
+# Popularity (paid orders, bookings) drifts without any model save
+MAX_AGE = 60 * 60
+
+# The shared version is read at most this often per process, not per
+# keystroke – other processes' changes show up within this many seconds
+VERSION_CHECK_INTERVAL = 5
+
+logger = logging.getLogger(__name__)
+
+
+# (type, queryset with .popularity, label field). Inactive workshops and
+# experiences are left out of the index.
+def suggest_sources():
+    return {
+        "product": (
+            Product.objects.annotate(
+                popularity=Coalesce(
+                    Sum("orderitem__quantity", filter=Q(orderitem__order__status="paid")),
+                    0,
+                )
+            ),
+            "name",
+        ),
+        "category": (
+            Category.objects.annotate(popularity=Count("products")),
+            "name",
+        ),
+        "workshop": (
+            Workshop.objects.filter(is_active=True).annotate(
+                popularity=Count("registrations", filter=Q(registrations__status="confirmed"))
+            ),
+            "name",
+        ),
+        "experience": (
+            Experience.objects.filter(is_active=True).annotate(
+                popularity=Count("bookings", filter=Q(bookings__status="confirmed"))
+            ),
+            "title",
+        ),
+    }
+
+
+def normalize(text):
+    # Case- and accent-insensitive: "Café" matches "cafe"
+    text = unicodedata.normalize("NFKD", text or "").casefold()
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.split())
+
+
+def index_terms(label):
+    """
+    Every word-suffix of the label, so "Tea Bowl Set" is found by
+    "tea b", "bowl s" and "set".
+    """
+    words = normalize(label).split()
+    return {" ".join(words[i:]) for i in range(len(words))}
+
+
+class _Node:
+    __slots__ = ("children", "entries", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.entries = set()  # keys whose term ends at this node
+        self.top = ()  # best TOP_K keys in this subtree
+
+
+class SuggestIndex:
+    """
+    Prefix trie over suggestion labels.
+
+    Every node caches the TOP_K most popular entries below it, so a lookup
+    is one walk down the prefix – no scan of the subtree. Inserting or
+    removing an entry only touches the nodes on its terms' paths.
+
+    Writes hold a lock; reads don't – they only ever see fully built
+    `top` tuples.
+    """
+
+    def __init__(self, version=0):
+        self.version = version
+        self.built_at = self.checked_at = time.monotonic()
+        self.root = _Node()
+        self.items = {}  # (type, id) -> suggestion dict
+        self.scores = {}  # (type, id) -> sort key
+        self.lock = threading.Lock()
+
+    @classmethod
+    def build(cls, version):
+        index = cls(version)
+        for kind, (queryset, label_field) in suggest_sources().items():
+            for obj in queryset:
+                index._put(kind, obj.pk, getattr(obj, label_field), obj.popularity)
+        return index
+
+    # ------------------------
+    # UPDATES
+    # ------------------------
+
+    def add(self, kind, pk, label, popularity):
+        with self.lock:
+            self._remove((kind, pk))
+            self._put(kind, pk, label, popularity)
+
+    def remove(self, kind, pk):
+        with self.lock:
+            self._remove((kind, pk))
+
+    def _put(self, kind, pk, label, popularity):
+        key = (kind, pk)
+        self.items[key] = {"type": kind, "id": pk, "label": label}
+        # Most popular first, then alphabetical
+        self.scores[key] = (-popularity, normalize(label), kind, str(pk))
+
+        for term in index_terms(label):
+            path = self._path(term, create=True)
+            path[-1].entries.add(key)
+            self._refresh(path, added=key)
+
+    def _remove(self, key):
+        item = self.items.get(key)
+        if item is None:
+            return
+
+        for term in index_terms(item["label"]):
+            path = self._path(term)
+            path[-1].entries.discard(key)
+            self._refresh(path, removed=key)
+            self._prune(term, path)
+
+        del self.items[key]
+        del self.scores[key]
+
+    def _path(self, term, create=False):
+        node, path = self.root, [self.root]
+        for char in term:
+            child = node.children.get(char)
+            if child is None:
+                if not create:
+                    break
+                child = node.children[char] = _Node()
+            node = child
+            path.append(node)
+        return path
+
+    def _refresh(self, path, added=None, removed=None):
+        score = self.scores.get
+        for node in reversed(path):
+            if added is not None:
+                if len(node.top) == TOP_K and score(added) >= score(node.top[-1]):
+                    break
+                candidates = set(node.top) | {added}
+            else:
+                if removed not in node.top:
+                    break
+                # Top of a subtree = best of its own entries + children's tops
+                candidates = set(node.entries)
+                for child in node.children.values():
+                    candidates.update(child.top)
+                candidates.discard(removed)
+            node.top = tuple(sorted(candidates, key=score)[:TOP_K])
+
+    def _prune(self, term, path):
+        # Drop trailing nodes that no longer lead anywhere
+        for depth in range(len(path) - 1, 0, -1):
+            node = path[depth]
+            if node.entries or node.children:
+                break
+            del path[depth - 1].children[term[depth - 1]]
+
+    # ------------------------
+    # LOOKUP
+    # ------------------------
+
+    def suggest(self, query, limit=TOP_K):
+        node = self.root
+        for char in normalize(query):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        items = [self.items.get(key) for key in node.top[:limit]]
+        # A concurrent removal may have dropped one already
+        return [item for item in items if item is not None]
+
+
+# =========================
+# PROCESS-WIDE INDEX
+# =========================
+
+_index = None
+_build_lock = threading.Lock()
+_rebuilding = False
+
+
+def get_suggest_index():
+    """
+    This process's index. Changes made in other processes bump the
+    "suggest" version; once this process sees that (checked every
+    VERSION_CHECK_INTERVAL seconds) it rebuilds in a background thread
+    and keeps answering from the old index until the new one is ready.
+    Only the very first lookup builds synchronously.
+    """
+    global _index
+
+    index = _index
+    now = time.monotonic()
+    if index is not None and now - index.checked_at < VERSION_CHECK_INTERVAL:
+        return index
+
+    version = get_catalog_version(SUGGEST_KEY)
+
+    if index is not None:
+        index.checked_at = now
+        if index.version != version or now - index.built_at >= MAX_AGE:
+            _rebuild_in_background(version)
+        return index
+
+    with _build_lock:
+        if _index is None:
+            _index = SuggestIndex.build(version)
+        return _index
+
+
+def _rebuild_in_background(version):
+    global _rebuilding
+
+    with _build_lock:
+        if _rebuilding:
+            return
+        _rebuilding = True
+
+    threading.Thread(target=_rebuild, args=(version,), daemon=True).start()
+
+
+def _rebuild(version):
+    global _index, _rebuilding
+
+    try:
+        index = SuggestIndex.build(version)
+        with _build_lock:
+            _index = index
+    except Exception:
+        logger.exception("Suggest index rebuild failed")
+    finally:
+        with _build_lock:
+            _rebuilding = False
+        connections.close_all()
+
+
+def apply_suggest_change(kind, pk, deleted=False):
+    """
+    Update this process's index in place for one saved or deleted object
+    and tell the other processes to rebuild.
+    """
+    before = get_catalog_version(SUGGEST_KEY)
+    bump_catalog_version(SUGGEST_KEY)
+    after = get_catalog_version(SUGGEST_KEY)
+
+    index = _index
+    if index is None:
+        return
+
+    # Re-read it: popularity is an aggregate, and inactive rows drop out
+    queryset, label_field = suggest_sources()[kind]
+    obj = None if deleted else queryset.filter(pk=pk).first()
+
+    if obj is None:
+        index.remove(kind, pk)
+    else:
+        index.add(kind, pk, getattr(obj, label_field), obj.popularity)
+
+    # Only skip the rebuild if nobody else changed anything meanwhile
+    if index.version == before and after == before + 1:
+        index.version = after
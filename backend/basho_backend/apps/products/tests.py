@@ -1,3 +1,860 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.forms import modelform_factory
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import columnar, export, suggest
+from .admin import ProductAdmin
+from .cache import bump_catalog_version, get_catalog_version
+from .encoders import ProductRowEncoder
+from .inventory import movement, record_movements, stock_at, take_snapshots
+from .models import Category, InventoryMovement, InventorySnapshot, Product
+from .pagination import ProductKeysetPagination
+from .serializers import ProductSerializer
+from .views import ProductListView
+from .singleflight import _fill, cached_single_flight
+
+
+def make_product(id="mug-1", category=None, **fields):
+    if category is None:
+        category, _ = Category.objects.get_or_create(name="Tableware", slug="tableware")
+    values = {
+        "name": "Tea Mug",
+        "description": "Stoneware mug",
+        "price": 100,
+        "stock": 5,
+        "weight": 0.5,
+        **fields,
+    }
+    return Product.objects.create(id=id, category=category, **values)
+
+
+# =========================
+# CATALOG CACHE
+# =========================
+
+class ContentAvailabilitySplitTests(TestCase):
+    def setUp(self):
+        # Versions restart with every test database transaction
+        cache.clear()
+        columnar._snapshot = None
+
+    def test_stock_only_save_keeps_the_catalog_version(self):
+        product = make_product()
+        before = get_catalog_version()
+
+        product.stock = 0
+        product.save(update_fields=["stock"])
+
+        self.assertEqual(get_catalog_version(), before)
+
+    def test_price_save_moves_the_catalog_version(self):
+        product = make_product()
+        before = get_catalog_version()
+
+        product.price = 120
+        product.save()
+
+        self.assertEqual(get_catalog_version(), before + 1)
+
+    def test_content_has_no_stock_and_availability_is_live(self):
+        product = make_product()
+        self.client.get("/api/products/")
+
+        product.stock = 0
+        product.save(update_fields=["stock"])
+        listing = self.client.get("/api/products/")
+        detail = self.client.get("/api/products/mug-1/")
+        availability = self.client.get("/api/products/availability/?ids=mug-1")
+
+        self.assertEqual(listing["Cache-Control"], "public, max-age=21600")
+        self.assertNotIn("stock", listing.json()[0])
+        self.assertNotIn("stock", detail.json())
+        self.assertEqual(
+            availability.json(),
+            [{"id": "mug-1", "stock": 0, "available": 0, "price": 100}],
+        )
+
+
+@override_settings(PRODUCTS_COLUMNAR_CATALOG=False)
+class CatalogResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_product()
+
+    def test_matching_etag_gets_a_304(self):
+        first = self.client.get("/api/products/", {"sort": "price_asc"})
+
+        repeat = self.client.get(
+            "/api/products/", {"sort": "price_asc"}, HTTP_IF_NONE_MATCH=first["ETag"]
+        )
+        other = self.client.get(
+            "/api/products/", {"sort": "price_desc"}, HTTP_IF_NONE_MATCH=first["ETag"]
+        )
+
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat["ETag"], first["ETag"])
+        self.assertEqual(other.status_code, 200)
+        self.assertNotEqual(other["ETag"], first["ETag"])
+
+    def test_version_bump_invalidates_the_cached_response(self):
+        first = self.client.get("/api/products/")
+        # Bypasses the signals: the cached body is still served
+        Product.objects.filter(id="mug-1").update(name="Tall Mug")
+        self.assertEqual(self.client.get("/api/products/").json()[0]["name"], "Tea Mug")
+
+        bump_catalog_version()
+        response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=first["ETag"])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+        self.assertEqual(response.json()[0]["name"], "Tall Mug")
+
+
+# =========================
+# KEYSET PAGINATION
+# =========================
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Two prices, one shared creation time: every sort has ties
+        for i in range(7):
+            make_product(f"mug-{i}", price=(100, 150)[i % 2], featured=i % 3 == 0)
+        Product.objects.update(created_at=timezone.now())
+        columnar._snapshot = None
+
+    def walk(self, sort):
+        ids, url, params = [], "/api/products/", {"sort": sort, "page_size": 2}
+        while url:
+            data = self.client.get(url, params).json()
+            ids += [item["id"] for item in data["results"]]
+            url, params = data["next"], None
+        return ids
+
+    def cursor(self, sort, values):
+        return sort, base64.urlsafe_b64encode(json.dumps([sort, values]).encode()).decode()
+
+    def test_pages_cover_every_product_once_in_order(self):
+        for sort, ordering in ProductKeysetPagination.SORT_ORDERINGS.items():
+            expected = list(Product.objects.order_by(*ordering).values_list("id", flat=True))
+            for columnar_on in (False, True):
+                with self.subTest(sort=sort, columnar=columnar_on):
+                    cache.clear()
+                    with override_settings(PRODUCTS_COLUMNAR_CATALOG=columnar_on):
+                        self.assertEqual(self.walk(sort), expected)
+
+    def test_bad_cursor_is_a_404(self):
+        cursors = [
+            ("price_asc", "not-base64!"),
+            self.cursor("price_asc", [100]),
+            ("price_asc", self.cursor("price_desc", [100, "mug-1"])[1]),
+            self.cursor("price_asc", ["cheap", "mug-1"]),
+            self.cursor("price_asc", [10 ** 30, "mug-1"]),
+            self.cursor("price_asc", [100, ["mug-1"]]),
+            self.cursor("featured", [1, "2026-01-01T00:00:00+00:00", "mug-1"]),
+            self.cursor("newest", ["2026-01-01", "mug-1"]),
+            self.cursor("newest", [None, "mug-1"]),
+        ]
+        for sort, cursor in cursors:
+            for columnar_on in (False, True):
+                with self.subTest(sort=sort, cursor=cursor, columnar=columnar_on):
+                    cache.clear()
+                    with override_settings(PRODUCTS_COLUMNAR_CATALOG=columnar_on):
+                        response = self.client.get(
+                            "/api/products/", {"sort": sort, "cursor": cursor}
+                        )
+                    self.assertEqual(response.status_code, 404)
+
+
+# =========================
+# PROJECTIONS
+# =========================
+
+class ProjectionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_product(images=["front.jpg", "side.jpg"], materials=["Stoneware clay"])
+        columnar._snapshot = None
+
+    def get(self, params, columnar_on=True):
+        cache.clear()
+        with override_settings(PRODUCTS_COLUMNAR_CATALOG=columnar_on):
+            return self.client.get("/api/products/", params)
+
+    def test_fields_limits_the_payload_to_the_requested_keys(self):
+        for columnar_on in (False, True):
+            with self.subTest(columnar=columnar_on):
+                response = self.get({"fields": "id, price,materials"}, columnar_on)
+                self.assertEqual(
+                    response.json(),
+                    [{"id": "mug-1", "price": 100, "materials": ["Stoneware clay"]}],
+                )
+
+    def test_unknown_field_is_rejected(self):
+        response = self.get({"fields": "id,stock"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("stock", response.json()["fields"])
+
+    def test_card_view_has_only_the_card_keys(self):
+        response = self.get({"view": "card"})
+
+        self.assertEqual(response.json(), [{
+            "id": "mug-1", "name": "Tea Mug", "category": "tableware",
+            "price": 100, "image": "front.jpg",
+        }])
+
+
+class ProductRowEncoderTests(TestCase):
+    def setUp(self):
+        make_product(
+            "mug-1", long_description="Thrown on the wheel.", weight=0.35,
+            images=["front.jpg"], available_colors=[{"name": "Earth Brown", "code": "#8B6F47"}],
+            features=["Handcrafted"], materials=["Stoneware clay"], care_instructions=["Hand wash"],
+            dimensions={"height": "7cm"}, related_products=["bowl-1"],
+            featured=True, is_customizable=True, is_microwave_safe=True,
+        )
+        # Nullable columns left empty
+        make_product("bowl-1", name="Bowl", weight=1)
+
+    def test_encoder_matches_the_serializer(self):
+        queryset = Product.objects.select_related("category").order_by("id")
+
+        for fields in (None, ["id", "longDescription", "category", "dimensions", "weight"]):
+            with self.subTest(fields=fields):
+                encoder = ProductRowEncoder(fields)
+                self.assertEqual(
+                    json.dumps(encoder.encode(encoder.rows(queryset))),
+                    json.dumps(ProductSerializer(queryset, many=True, fields=fields).data),
+                )
+
+
+# =========================
+# RELATED PRODUCTS
+# =========================
+
+class ExpandRelatedProductsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(4):
+            make_product(f"bowl-{i}", name=f"Bowl {i}", images=[f"{i}.jpg"])
+        make_product("mug-1", related_products=["bowl-2", "gone", "bowl-0"])
+        make_product("mug-2", related_products=["bowl-0", "bowl-1", "bowl-2", "bowl-3"])
+        columnar._snapshot = None
+
+    def detail(self, pk):
+        return self.client.get(f"/api/products/{pk}/", {"expand": "relatedProducts"})
+
+    def test_related_ids_become_cards_and_missing_ones_are_dropped(self):
+        related = self.detail("mug-1").json()["relatedProducts"]
+
+        self.assertEqual([card["id"] for card in related], ["bowl-2", "bowl-0"])
+        self.assertEqual(related[0], {
+            "id": "bowl-2", "name": "Bowl 2", "category": "tableware",
+            "price": 100, "image": "2.jpg",
+        })
+
+    def test_expansion_is_one_query_however_many_ids(self):
+        # Detail payloads cached, so only the expansion hits the database
+        self.detail("mug-1")
+        self.detail("mug-2")
+
+        with CaptureQueriesContext(connection) as few:
+            self.detail("mug-1")
+        with self.assertNumQueries(len(few.captured_queries)):
+            self.detail("mug-2")
+
+        with CaptureQueriesContext(connection) as plain:
+            self.client.get("/api/products/mug-2/")
+        self.assertEqual(len(few.captured_queries), len(plain.captured_queries) + 1)
+
+    def test_list_expansion_is_one_query_for_the_page(self):
+        # Builds the columnar snapshot outside the measured requests
+        self.client.get("/api/products/")
+        cache.clear()
+        with CaptureQueriesContext(connection) as plain:
+            self.client.get("/api/products/")
+        cache.clear()
+        with CaptureQueriesContext(connection) as expanded:
+            response = self.client.get("/api/products/", {"expand": "relatedProducts"})
+
+        by_id = {item["id"]: item for item in response.json()}
+        self.assertEqual(
+            [card["id"] for card in by_id["mug-2"]["relatedProducts"]],
+            ["bowl-0", "bowl-1", "bowl-2", "bowl-3"],
+        )
+        self.assertEqual(len(expanded.captured_queries), len(plain.captured_queries) + 1)
+
+    def test_unknown_expansion_is_rejected(self):
+        response = self.client.get("/api/products/mug-1/", {"expand": "category"})
+        self.assertEqual(response.status_code, 400)
+
+
+# =========================
+# FACETS
+# =========================
+
+@override_settings(PRODUCTS_COLUMNAR_CATALOG=False)
+class FacetFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        brown = {"name": "Earth Brown", "code": "#8B6F47"}
+        white = {"name": "Matte White", "code": "#F5F5DC"}
+        make_product(
+            "mug-1", price=100, available_colors=[brown], materials=["Stoneware clay"],
+            is_microwave_safe=True,
+        )
+        make_product(
+            "mug-2", price=300, available_colors=[brown, white], materials=["Porcelain"],
+        )
+        make_product(
+            "mug-3", price=500, available_colors=[white], materials=["Stoneware clay"],
+            is_food_safe=False,
+        )
+
+    def get(self, **params):
+        return self.client.get("/api/products/", params).json()
+
+    def ids(self, **params):
+        return sorted(item["id"] for item in self.get(**params))
+
+    def test_filters(self):
+        self.assertEqual(self.ids(color="Matte White"), ["mug-2", "mug-3"])
+        self.assertEqual(
+            self.ids(color=["Earth Brown", "Matte White"], material="Porcelain"), ["mug-2"]
+        )
+        self.assertEqual(self.ids(material="Stoneware clay", food_safe="true"), ["mug-1"])
+        self.assertEqual(self.ids(microwave_safe="false", max_price="400"), ["mug-2"])
+        self.assertEqual(self.ids(min_price="200"), ["mug-2", "mug-3"])
+
+    def test_bad_filter_value_is_rejected(self):
+        self.assertEqual(self.client.get("/api/products/", {"food_safe": "maybe"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/products/", {"min_price": "cheap"}).status_code, 400)
+
+    def test_counts_cover_the_filtered_products(self):
+        data = self.get(facets="1", material="Stoneware clay")
+
+        self.assertEqual(sorted(item["id"] for item in data["results"]), ["mug-1", "mug-3"])
+        self.assertEqual(data["facets"], {
+            "total": 2,
+            "colors": {"Earth Brown": 1, "Matte White": 1},
+            "materials": {"Stoneware clay": 2},
+            "flags": {"food_safe": 1, "microwave_safe": 1, "dishwasher_safe": 0},
+            "price": {"min": 100, "max": 500},
+        })
+
+
+# =========================
+# SEARCH
+# =========================
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_product("plate-1", name="Dinner Plate", description="Pairs with a tea bowl")
+        make_product("bowl-1", name="Tea Bowl", description="Stoneware bowl")
+        make_product("vase-1", name="Bud Vase", description="Stoneware vase")
+
+    def search(self, q):
+        return [item["id"] for item in self.client.get("/api/products/search/", {"q": q}).json()]
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search("tea bowl"), ["bowl-1", "plate-1"])
+
+    def test_partial_words_match_as_prefixes(self):
+        self.assertEqual(self.search("bu va"), ["vase-1"])
+        self.assertEqual(self.search("stonew"), ["bowl-1", "vase-1"])
+
+    def test_query_without_words_finds_nothing(self):
+        self.assertEqual(self.search("&|!"), [])
+        self.assertEqual(self.search(""), [])
+
+
+# =========================
+# COLUMNAR CATALOG
+# =========================
+
+class ColumnarMatchesOrmTests(TestCase):
+    SCOPES = ["/api/products/", "/api/products/category/tableware/", "/api/products/featured/"]
+    FILTERS = [
+        {},
+        {"food_safe": "true"},
+        {"microwave_safe": "false", "min_price": "150"},
+        {"max_price": "200"},
+        {"fields": "id,name,price"},
+    ]
+
+    def setUp(self):
+        cache.clear()
+        decor = Category.objects.create(name="Decor", slug="decor")
+        # Repeated prices, flags and creation times so every ordering has
+        # to break ties on id; mixed-case ids where collations disagree
+        ids = ["mug-1", "Mug-2", "mug_3", "MUG-4", "bowl-10", "bowl-9", "a b", "ab", "Z-1"]
+        for i, pk in enumerate(ids):
+            make_product(
+                pk, decor if i % 4 == 3 else None,
+                name=f"Item {i}", price=(100, 150, 200)[i % 3],
+                featured=i % 2 == 0, is_food_safe=i % 3 != 1, is_microwave_safe=i % 2 == 1,
+            )
+        Product.objects.filter(id__in=ids[:5]).update(created_at=timezone.now())
+        columnar._snapshot = None
+
+    def pages(self, url, params, columnar_on):
+        cache.clear()
+        pages, params = [], dict(params)
+        with override_settings(PRODUCTS_COLUMNAR_CATALOG=columnar_on):
+            while url:
+                data = self.client.get(url, params).json()
+                if isinstance(data, list):
+                    # Unpaginated (featured): no defined order in SQL
+                    return sorted(data, key=lambda item: item["id"])
+                pages.append(data["results"])
+                url, params = data["next"], None
+        return pages
+
+    def test_every_sort_and_filter_gives_the_same_pages(self):
+        for scope in self.SCOPES:
+            for sort in ProductKeysetPagination.SORT_ORDERINGS:
+                for filters in self.FILTERS:
+                    params = {"sort": sort, "page_size": 2, **filters}
+                    with self.subTest(scope=scope, **params):
+                        self.assertEqual(
+                            self.pages(scope, params, columnar_on=True),
+                            self.pages(scope, params, columnar_on=False),
+                        )
+
+    def test_cursor_on_a_deleted_product_falls_back_to_sql(self):
+        params = {"sort": "price_asc", "page_size": 2}
+        with override_settings(PRODUCTS_COLUMNAR_CATALOG=True):
+            first = self.client.get("/api/products/", params).json()
+            Product.objects.filter(id=first["results"][-1]["id"]).delete()
+            # A snapshot built after the delete, so the cursor's id is unknown
+            columnar._snapshot = None
+            with mock.patch.object(
+                ProductListView, "list_from_queryset", autospec=True,
+                side_effect=ProductListView.list_from_queryset,
+            ) as from_queryset:
+                rest = self.client.get(first["next"]).json()["results"]
+
+        from_queryset.assert_called_once()
+        expected = list(
+            Product.objects.order_by("price", "id").values_list("id", flat=True)[1:3]
+        )
+        self.assertEqual([item["id"] for item in rest], expected)
+
+
+class ColumnarSnapshotRefreshTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_product()
+        columnar._snapshot = columnar.ColumnarCatalog.build(get_catalog_version() - 1)
+
+    def test_stale_snapshot_answers_while_rebuilding_and_is_not_cached(self):
+        with mock.patch.object(columnar, "_rebuild_in_background") as rebuild:
+            response = self.client.get("/api/products/")
+
+        rebuild.assert_called_once_with(get_catalog_version())
+        self.assertEqual(response.json()[0]["id"], "mug-1")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        self.assertFalse(response.has_header("ETag"))
+
+    def test_background_rebuild_publishes_the_new_snapshot(self):
+        old = columnar._snapshot
+        version = get_catalog_version()
+        built = columnar.ColumnarCatalog(version, [])
+
+        with mock.patch.object(columnar.ColumnarCatalog, "build", return_value=built) as build:
+            self.assertIs(columnar.get_columnar_catalog(version), old)
+            for _ in range(100):
+                if columnar._snapshot is built:
+                    break
+                threading.Event().wait(0.01)
+
+        build.assert_called_once_with(version)
+        self.assertIs(columnar._snapshot, built)
+
+
+# =========================
+# SINGLE FLIGHT
+# =========================
+
+class SingleFlightLockTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_waiter_that_times_out_keeps_the_holders_lock(self):
+        cache.add("k:lock", "holder", 10)
+
+        value = _fill("k", 1, lambda: "computed", 60, 600, 10, wait=0)
+
+        self.assertEqual(value, "computed")
+        self.assertEqual(cache.get("k:lock"), "holder")
+
+    def test_holder_releases_its_lock(self):
+        _fill("k", 1, lambda: "computed", 60, 600, 10, wait=0)
+
+        self.assertIsNone(cache.get("k:lock"))
+        self.assertEqual(cache.get("k")["value"], "computed")
+
+    def test_holder_releases_its_lock_on_error(self):
+        compute = mock.Mock(side_effect=RuntimeError("boom"))
+
+        with self.assertRaises(RuntimeError):
+            _fill("k", 1, compute, 60, 600, 10, wait=0)
+
+        self.assertIsNone(cache.get("k:lock"))
+
+
+class SoftTtlRefreshTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        # Past its soft TTL as soon as it is stored
+        cached_single_flight("k", 1, lambda: "old", soft_ttl=0)
+
+    def test_stale_entry_is_served_while_one_refresh_runs(self):
+        release, refreshed = threading.Event(), threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(2)
+            return "new"
+
+        self.assertEqual(cached_single_flight("k", 1, compute, soft_ttl=60), "old")
+        # The refresh holds the lock, so a second stale read starts no other
+        self.assertEqual(cached_single_flight("k", 1, compute, soft_ttl=60), "old")
+        release.set()
+
+        for _ in range(200):
+            if cache.get("k:lock") is None and cache.get("k")["value"] == "new":
+                refreshed.set()
+                break
+            threading.Event().wait(0.01)
+
+        self.assertTrue(refreshed.is_set())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cached_single_flight("k", 1, compute, soft_ttl=60), "new")
+
+    def test_new_version_recomputes_in_the_caller(self):
+        value = cached_single_flight("k", 2, lambda: "v2", soft_ttl=60)
+
+        self.assertEqual(value, "v2")
+        self.assertEqual(cache.get("k")["version"], 2)
+
+
+# =========================
+# STATIC EXPORT
+# =========================
+
+class ExportLockTests(SimpleTestCase):
+    def setUp(self):
+        self.static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.static_root.cleanup)
+        override = override_settings(STATIC_ROOT=self.static_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_export_runs_are_serialized(self):
+        entered = threading.Event()
+        second_started = threading.Event()
+        order = []
+
+        def first_run(slugs):
+            order.append("first:start")
+            entered.set()
+            second_started.wait(1)
+            order.append("first:end")
+
+        def second_run(slugs):
+            order.append("second")
+
+        with mock.patch.object(export, "_export_catalog", side_effect=first_run):
+            first = threading.Thread(target=export.export_catalog, args=(None,))
+            first.start()
+            entered.wait(1)
+
+        with mock.patch.object(export, "_export_catalog", side_effect=second_run):
+            second = threading.Thread(target=export.export_catalog, args=(None,))
+            second.start()
+            second_started.set()
+            first.join(2)
+            second.join(2)
+
+        self.assertEqual(order, ["first:start", "first:end", "second"])
+
+    def test_prune_keeps_manifest_files_and_lock(self):
+        kept = export.write_export("all", [1])
+        dropped = export.write_export("all", [2])
+        with export.export_lock():
+            pass
+
+        export.prune_exports({"all": export.export_url(kept)})
+
+        names = {path.name for path in export.export_dir().iterdir()}
+        self.assertIn(kept, names)
+        self.assertIn(f"{kept}.gz", names)
+        self.assertNotIn(dropped, names)
+        self.assertIn(export.LOCK_NAME, names)
+
+
+class IncrementalExportTests(TestCase):
+    def setUp(self):
+        self.static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.static_root.cleanup)
+        override = override_settings(STATIC_ROOT=self.static_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.tableware = Category.objects.create(name="Tableware", slug="tableware")
+        self.decor = Category.objects.create(name="Decor", slug="decor")
+        make_product("mug-1", self.tableware)
+        make_product("vase-1", self.decor, name="Vase")
+        self.manifest = export.export_catalog()
+
+    def test_only_the_changed_category_is_rewritten(self):
+        Product.objects.filter(id="mug-1").update(name="Big Mug")
+        written = []
+        write_export = export.write_export
+
+        def record(name, payload, quality):
+            written.append((name, quality))
+            return write_export(name, payload, quality)
+
+        with mock.patch.object(export, "write_export", side_effect=record):
+            manifest = export.export_catalog(["tableware"])
+
+        quality = export.INCREMENTAL_BROTLI_QUALITY
+        self.assertEqual(
+            written, [("all", quality), ("featured", quality), ("category-tableware", quality)]
+        )
+        self.assertNotEqual(manifest["category-tableware"], self.manifest["category-tableware"])
+        self.assertEqual(manifest["category-decor"], self.manifest["category-decor"])
+
+        # The replaced files are pruned, the untouched category's stay
+        names = {path.name for path in export.export_dir().iterdir()}
+        self.assertNotIn(self.manifest["category-tableware"].rsplit("/", 1)[-1], names)
+        self.assertIn(self.manifest["category-decor"].rsplit("/", 1)[-1], names)
+
+    def test_scheduled_export_runs_off_the_request_thread(self):
+        done = threading.Event()
+        calls = []
+
+        def run(slugs):
+            calls.append((slugs, threading.current_thread()))
+            done.set()
+
+        with mock.patch.object(export, "export_catalog", side_effect=run):
+            with self.captureOnCommitCallbacks(execute=True):
+                export.schedule_catalog_export(["decor", "tableware", None])
+            self.assertTrue(done.wait(2))
+
+        self.assertEqual(calls[0][0], ["decor", "tableware"])
+        self.assertIsNot(calls[0][1], threading.current_thread())
+
+
+# =========================
+# AUTOCOMPLETE INDEX
+# =========================
+
+class SuggestIndexRefreshTests(SimpleTestCase):
+    def setUp(self):
+        suggest._index = None
+        self.addCleanup(setattr, suggest, "_index", None)
+
+        patcher = mock.patch.object(suggest, "get_catalog_version", return_value=1)
+        self.get_version = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch.object(
+            suggest.SuggestIndex, "build", side_effect=suggest.SuggestIndex
+        )
+        self.build = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_version_is_not_read_on_every_lookup(self):
+        first = suggest.get_suggest_index()
+        for _ in range(10):
+            self.assertIs(suggest.get_suggest_index(), first)
+
+        self.assertEqual(self.get_version.call_count, 1)
+
+    def test_stale_index_keeps_serving_while_rebuilt_in_background(self):
+        old = suggest.get_suggest_index()
+        old.checked_at -= suggest.VERSION_CHECK_INTERVAL
+        self.get_version.return_value = 2
+
+        with mock.patch.object(suggest.threading, "Thread") as thread:
+            self.assertIs(suggest.get_suggest_index(), old)
+
+        thread.assert_called_once()
+        self.assertEqual(thread.call_args.kwargs["args"], (2,))
+        self.assertEqual(self.build.call_count, 1)
+
+        suggest._rebuilding = False
+        with mock.patch.object(suggest.connections, "close_all"):
+            suggest._rebuild(2)
+        self.assertIsNot(suggest.get_suggest_index(), old)
+        self.assertEqual(suggest._index.version, 2)
+
+
+# =========================
+# BULK IMPORT
+# =========================
+
+@mock.patch("apps.products.management.commands.import_products.export_catalog")
+class PartialImportTests(TestCase):
+    def import_csv(self, text):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as fh:
+            fh.write(text)
+        self.addCleanup(os.unlink, fh.name)
+        out, err = io.StringIO(), io.StringIO()
+        call_command("import_products", fh.name, stdout=out, stderr=err)
+        return err.getvalue()
+
+    def test_partial_feed_updates_only_its_columns(self, export_catalog):
+        make_product(name="Tea Mug", price=100, stock=5)
+
+        self.import_csv("id,price,stock\nmug-1,120,9\n")
+
+        product = Product.objects.get(id="mug-1")
+        self.assertEqual((product.price, product.stock), (120, 9))
+        self.assertEqual(product.name, "Tea Mug")
+        self.assertEqual(product.category.slug, "tableware")
+        export_catalog.assert_called_once_with(["tableware"])
+
+    def test_partial_feed_skips_new_products(self, export_catalog):
+        make_product()
+
+        errors = self.import_csv("id,price,stock\nmug-1,120,9\nmug-2,80,3\n")
+
+        self.assertFalse(Product.objects.filter(id="mug-2").exists())
+        self.assertIn("line 3: no product 'mug-2' to update", errors)
+        self.assertEqual(Product.objects.get(id="mug-1").price, 120)
+
+    def test_full_feed_inserts_new_products(self, export_catalog):
+        make_product()
+
+        self.import_csv(
+            "id,category,name,description,price,stock,weight\n"
+            "mug-2,tableware,Bowl,Stoneware bowl,80,3,0.4\n"
+        )
+
+        self.assertEqual(Product.objects.get(id="mug-2").name, "Bowl")
+
+
+# =========================
+# INVENTORY LEDGER
+# =========================
+
+class InventoryLedgerTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.product = make_product(stock=10)
+        # Move the opening balance back so the timeline is explicit
+        InventoryMovement.objects.filter(product=self.product).update(
+            created_at=self.now - timedelta(hours=5)
+        )
+
+    def move(self, hours_ago, stock_delta, kind="sale"):
+        record_movements([movement(self.product.pk, kind, stock_delta=stock_delta)])
+        InventoryMovement.objects.filter(product=self.product, created_at__gt=self.now).update(
+            created_at=self.now - timedelta(hours=hours_ago)
+        )
+
+    def test_stock_at_a_past_time_across_a_snapshot(self):
+        self.move(4, -2)
+        self.move(3, -1)
+        take_snapshots(self.now - timedelta(hours=2))
+        self.move(1, 5, kind="restock")
+
+        def stock(hours_ago):
+            return stock_at(self.product.pk, self.now - timedelta(hours=hours_ago))["stock"]
+
+        # Before the snapshot: read from the movements alone
+        self.assertEqual(stock(3.5), 8)
+        # After it: the snapshot plus the later movements
+        self.assertEqual(stock(1.5), 7)
+        self.assertEqual(stock(0), 12)
+        self.assertEqual(InventorySnapshot.objects.get().stock, 7)
+
+    def test_snapshot_only_products_that_moved(self):
+        self.move(3, -2)
+        take_snapshots(self.now - timedelta(hours=2))
+
+        self.assertEqual(take_snapshots(self.now - timedelta(hours=1)), 0)
+        self.assertEqual(InventorySnapshot.objects.count(), 1)
+
+    def test_snapshot_command_reports_and_reconciles_drift(self):
+        # A write that bypassed the ledger
+        Product.objects.filter(pk=self.product.pk).update(stock=7)
+        out = io.StringIO()
+
+        call_command("snapshot_inventory", stdout=out)
+        self.assertIn("mug-1: stock is -3 vs ledger", out.getvalue())
+        self.assertEqual(InventorySnapshot.objects.get().stock, 10)
+
+        call_command("snapshot_inventory", "--reconcile", stdout=io.StringIO())
+        self.assertEqual(stock_at(self.product.pk)["stock"], 7)
+
+        out = io.StringIO()
+        call_command("snapshot_inventory", stdout=out)
+        self.assertNotIn("vs ledger", out.getvalue())
+
+
+class AdminStockAdjustmentTests(TestCase):
+    def setUp(self):
+        self.product = make_product(stock=10)
+        self.request = RequestFactory().post("/admin/")
+        self.request.user = get_user_model().objects.create(username="staff", is_staff=True)
+        self.admin = ProductAdmin(Product, site)
+
+    def submit(self, **changes):
+        # The form is loaded now; anything after this happens "meanwhile"
+        Form = modelform_factory(Product, fields=("name", "price", "stock", "category"))
+        product = Product.objects.get(pk=self.product.pk)
+        form = Form(instance=product)
+        data = {**form.initial, **changes}
+        return lambda: self.save(Form(data, instance=product))
+
+    def save(self, form):
+        self.assertTrue(form.is_valid(), form.errors)
+        self.admin.save_model(self.request, form.save(commit=False), form, change=True)
+
+    def test_adjustment_is_applied_to_the_current_stock(self):
+        save = self.submit(stock=15)
+        # A sale lands between form load and submit
+        Product.objects.filter(pk=self.product.pk).update(stock=8)
+        record_movements([movement(self.product.pk, "sale", stock_delta=-2)])
+
+        save()
+
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock, 13)
+        adjustment = InventoryMovement.objects.get(kind="restock")
+        self.assertEqual(adjustment.stock_delta, 5)
+        self.assertEqual(stock_at(self.product.pk)["stock"], 13)
+
+    def test_save_without_a_stock_edit_keeps_the_current_stock(self):
+        save = self.submit(name="Tall Mug")
+        Product.objects.filter(pk=self.product.pk).update(stock=8)
+        record_movements([movement(self.product.pk, "sale", stock_delta=-2)])
+
+        save()
+
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual((product.name, product.stock), ("Tall Mug", 8))
+        self.assertFalse(InventoryMovement.objects.filter(kind__in=["restock", "adjustment"]).exists())
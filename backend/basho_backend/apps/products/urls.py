@@ -4,6 +4,10 @@ from .views import (
     ProductDetailView,
     ProductByCategoryView,
     FeaturedProductListView,
+    ProductSearchView,
+    CatalogManifestView,
+    ProductAvailabilityView,
+    ProductSuggestView,
     CustomOrderCreateView,
 )
 from .admin_views import send_custom_order_email
@@ -15,6 +19,10 @@ urlpatterns = [
     path("", ProductListView.as_view(), name="product-list"),
     path("featured/", FeaturedProductListView.as_view(), name="featured-products"),
     path("category/<slug:slug>/", ProductByCategoryView.as_view(), name="products-by-category"),
+    path("search/", ProductSearchView.as_view(), name="product-search"),
+    path("catalog/manifest/", CatalogManifestView.as_view(), name="catalog-manifest"),
+    path("suggest/", ProductSuggestView.as_view(), name="product-suggest"),
+    path("availability/", ProductAvailabilityView.as_view(), name="product-availability"),
     # Custom Orders (MUST come before <str:id>)
     path("custom-orders/", CustomOrderCreateView.as_view(), name="custom-order-create"),
     # Single product
@@ -2,9 +2,29 @@ from django.shortcuts import render
 from django.urls import reverse
 
 from rest_framework import generics,status
+from rest_framework.exceptions import ValidationError
+from django.db.models.fields.json import KT
+from django.contrib.postgres.search import SearchRank
+from django.db.models import F
+from django.db.models.functions import Greatest
 from .models import Product
-from .serializers import ProductSerializer,CustomOrderSerializer 
+from .serializers import ProductSerializer,ProductCardSerializer,CustomOrderSerializer 
 from .models import CustomOrder, CustomOrderImage
+from .cache import (
+    AVAILABILITY_CACHE_CONTROL,
+    CONTENT_CACHE_CONTROL,
+    CatalogCacheMixin,
+    get_catalog_version,
+)
+from .singleflight import cached_single_flight
+from .columnar import CatalogMiss, get_columnar_catalog
+from .suggest import TOP_K, get_suggest_index
+from .pagination import ProductKeysetPagination
+from .encoders import ProductRowEncoder
+from .search import prefix_search_query
+from .filters import ProductFacetFilter, facet_counts
+from .export import read_manifest
+from apps.orders.holds import held_subquery
  
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -19,22 +39,254 @@ from django.template.loader import render_to_string
 from django.conf import settings
 
 
+def card_queryset(queryset):
+    # Columns needed by ProductCardSerializer (+ keyset sort keys)
+    return queryset.only(
+        "id", "name", "price", "featured", "created_at",
+        "category__slug",
+    ).annotate(image=KT("images__0"))
+
+
+EXPANDABLE = {"relatedProducts"}
+
+
+def get_expand(request):
+    raw = request.query_params.get("expand")
+    if not raw:
+        return set()
+
+    expand = {e.strip() for e in raw.split(",") if e.strip()}
+    unknown = expand - EXPANDABLE
+    if unknown:
+        raise ValidationError({
+            "expand": f"Cannot expand: {', '.join(sorted(unknown))}"
+        })
+    return expand
+
+
+def expand_related_products(items):
+    """
+    Replace relatedProducts id lists with product cards, resolving the ids
+    of every item in one id__in query. Ids that no longer exist are dropped.
+    """
+    items = [item for item in items if item.get("relatedProducts")]
+    ids = {pk for item in items for pk in item["relatedProducts"]}
+    if not ids:
+        return
+
+    cards = card_queryset(
+        Product.objects.select_related("category").filter(id__in=ids)
+    )
+    by_id = {
+        card["id"]: card
+        for card in ProductCardSerializer(cards, many=True).data
+    }
+
+    for item in items:
+        item["relatedProducts"] = [
+            by_id[pk] for pk in item["relatedProducts"] if pk in by_id
+        ]
+
+
+class ProductProjectionMixin:
+    """
+    ?view=card -> compact card payload (DRF, first image annotated)
+    ?fields=id,name,price -> sparse product payload
+
+    Everything except the card view is encoded by ProductRowEncoder from
+    values_list() rows, so only the requested columns are read and the
+    per-field serializer machinery is skipped.
+    """
+
+    def get_requested_fields(self):
+        raw = self.request.query_params.get("fields")
+        if not raw:
+            return None
+
+        fields = [f.strip() for f in raw.split(",") if f.strip()]
+        unknown = set(fields) - set(ProductSerializer.Meta.fields)
+        if unknown:
+            raise ValidationError({
+                "fields": f"Unknown field(s): {', '.join(sorted(unknown))}"
+            })
+        return fields
+
+    def is_card_view(self):
+        return self.request.query_params.get("view") == "card"
+
+    def get_serializer_class(self):
+        if self.is_card_view():
+            return ProductCardSerializer
+        return super().get_serializer_class()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+
+        if self.is_card_view():
+            return card_queryset(queryset)
+
+        return queryset
+
+    def wants_facets(self):
+        return self.request.query_params.get("facets") in ("1", "true")
+
+    # ------------------------
+    # COLUMNAR CATALOG
+    # ------------------------
+
+    def get_catalog_scope(self):
+        """
+        The view's own filter as ColumnarCatalog.mask() keyword arguments,
+        or None if the view can only be answered with SQL.
+        """
+        return None
+
+    def get_catalog_filters(self):
+        if not settings.PRODUCTS_COLUMNAR_CATALOG or self.is_card_view():
+            return None
+
+        scope = self.get_catalog_scope()
+        filters = ProductFacetFilter().catalog_filters(self.request)
+        if scope is None or filters is None:
+            return None
+        return {**filters, **scope}
+
+    def list_from_catalog(self, filters):
+        version = getattr(self, "catalog_version", None)
+        catalog = get_columnar_catalog(version)
+        if version is not None and catalog.version != version:
+            # Previous snapshot while the new one builds: right for now,
+            # but not to be cached under the new version
+            self.response_cacheable = False
+        mask = catalog.mask(**filters)
+
+        hits = None
+        if self.paginator is not None:
+            hits = self.paginator.paginate_catalog(catalog, mask, self.request)
+
+        paginated = hits is not None
+        if not paginated:
+            hits = catalog.select(mask)
+        return catalog.encode(hits, self.get_requested_fields()), paginated
+
+    def list_from_queryset(self, queryset):
+        if self.is_card_view():
+            rows = queryset
+            encode = lambda page: self.get_serializer(page, many=True).data
+        else:
+            encoder = ProductRowEncoder(self.get_requested_fields())
+            rows = encoder.rows(queryset)
+            encode = encoder.encode
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return encode(page), True
+        return encode(rows), False
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        filters = self.get_catalog_filters()
+        try:
+            if filters is None:
+                raise CatalogMiss
+            data, paginated = self.list_from_catalog(filters)
+        except CatalogMiss:
+            data, paginated = self.list_from_queryset(queryset)
+
+        if "relatedProducts" in get_expand(request):
+            expand_related_products(data)
+
+        if paginated:
+            response = self.get_paginated_response(data)
+        elif self.wants_facets():
+            response = Response({"results": data})
+        else:
+            return Response(data)
+
+        # ?facets=1 adds counts for the whole filtered result set
+        if self.wants_facets():
+            response.data["facets"] = facet_counts(queryset)
+        return response
+
+
 # List all products
-class ProductListView(generics.ListAPIView):
+class ProductListView(CatalogCacheMixin, ProductProjectionMixin, generics.ListAPIView):
     queryset = Product.objects.select_related("category").all()
     serializer_class = ProductSerializer
+    pagination_class = ProductKeysetPagination
+    filter_backends = [ProductFacetFilter]
+
+    def get_catalog_scope(self):
+        return {}
 
 
 # Single product detail
 class ProductDetailView(generics.RetrieveAPIView):
-    queryset = Product.objects.select_related("category").all()
+    queryset = Product.objects.select_related("category").defer("search_vector")
     serializer_class = ProductSerializer
     lookup_field = "id"
 
+    # Served from cache for this long, then refreshed in the background
+    soft_ttl = 60
+
+    def retrieve(self, request, *args, **kwargs):
+        expand = get_expand(request)
+
+        # One request per product recomputes on a miss; the rest wait for
+        # it (across workers only with a shared cache, see REDIS_URL)
+        data = dict(cached_single_flight(
+            f"products:detail:{self.kwargs['id']}",
+            get_catalog_version(),
+            lambda: dict(self.get_serializer(self.get_object()).data),
+            soft_ttl=self.soft_ttl,
+        ))
+
+        # ?expand=relatedProducts embeds cards instead of bare ids
+        if "relatedProducts" in expand:
+            expand_related_products([data])
+
+        response = Response(data)
+        response["Cache-Control"] = CONTENT_CACHE_CONTROL
+        return response
+
+
+# Live stock + price: /api/products/availability/?ids=a,b,c
+class ProductAvailabilityView(APIView):
+    max_ids = 100
+
+    def get(self, request):
+        ids = [i for i in request.query_params.get("ids", "").split(",") if i]
+
+        if not ids:
+            return Response(
+                {"error": "ids query param is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(ids) > self.max_ids:
+            return Response(
+                {"error": f"At most {self.max_ids} ids per request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # stock / price come from product_stock_cover_idx, held units from
+        # the partial index on live stock holds
+        rows = (
+            Product.objects.filter(id__in=ids)
+            .annotate(available=Greatest(F("stock") - held_subquery(), 0))
+            .values("id", "stock", "available", "price")
+        )
+
+        response = Response(list(rows))
+        response["Cache-Control"] = AVAILABILITY_CACHE_CONTROL
+        return response
+
 
 # Products by category slug
-class ProductByCategoryView(generics.ListAPIView):
+class ProductByCategoryView(CatalogCacheMixin, ProductProjectionMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
+    pagination_class = ProductKeysetPagination
+    filter_backends = [ProductFacetFilter]
 
     def get_queryset(self):
         slug = self.kwargs["slug"]
@@ -42,16 +294,75 @@ class ProductByCategoryView(generics.ListAPIView):
             category__slug=slug
         )
 
+    def get_catalog_scope(self):
+        return {"category": self.kwargs["slug"]}
+
 
 # Featured products
-class FeaturedProductListView(generics.ListAPIView):
+class FeaturedProductListView(CatalogCacheMixin, ProductProjectionMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
+    filter_backends = [ProductFacetFilter]
 
     def get_queryset(self):
         return Product.objects.select_related("category").filter(
             featured=True
         )
 
+    def get_catalog_scope(self):
+        return {"featured": True}
+
+# Full-text search: /api/products/search/?q=tea bo
+class ProductSearchView(CatalogCacheMixin, ProductProjectionMixin, generics.ListAPIView):
+    serializer_class = ProductSerializer
+    filter_backends = [ProductFacetFilter]
+    max_results = 50
+
+    def get_queryset(self):
+        query = prefix_search_query(self.request.query_params.get("q"))
+        if query is None:
+            return Product.objects.none()
+
+        return (
+            Product.objects.select_related("category")
+            .filter(search_vector=query)
+            .annotate(rank=SearchRank(F("search_vector"), query))
+            .order_by("-rank", "id")
+        )
+
+    def filter_queryset(self, queryset):
+        return super().filter_queryset(queryset)[: self.max_results]
+
+# Autocomplete: /api/products/suggest/?q=tea b
+class ProductSuggestView(APIView):
+
+    def get(self, request):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response([])
+
+        try:
+            limit = min(max(int(request.query_params.get("limit", TOP_K)), 1), TOP_K)
+        except ValueError:
+            limit = TOP_K
+
+        response = Response(get_suggest_index().suggest(query, limit))
+        response["Cache-Control"] = "public, max-age=60"
+        return response
+
+# URLs of the precompressed static catalog exports
+class CatalogManifestView(APIView):
+    def get(self, request):
+        manifest = read_manifest()
+        if not manifest:
+            return Response(
+                {"error": "Catalog export not built yet"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        response = Response(manifest)
+        response["Cache-Control"] = "no-cache"
+        return response
+
 # Create custom order
 class CustomOrderCreateView(generics.CreateAPIView):
     queryset = CustomOrder.objects.all()
@@ -54,6 +54,7 @@ INSTALLED_APPS = [
     "django.contrib.auth",
     "django.contrib.contenttypes",
     "django.contrib.sessions",
+    "django.contrib.postgres",
     
     "rest_framework",
     'corsheaders',
@@ -147,7 +148,7 @@ JAZZMIN_SETTINGS = {
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "apps.products.middleware.CatalogWhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -290,6 +291,28 @@ USE_TZ = True
  
 FRONTEND_URL = "https://basho-by-shivangi-tau.vercel.app"
 
+# Catalog responses, single-flight locks and soft-TTL entries live here.
+# Set REDIS_URL to share them between gunicorn workers; without it every
+# worker has its own LocMemCache and coalesces requests only within itself.
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Answer product listings from the in-memory NumPy catalog snapshot
+# (apps/products/columnar.py) instead of Postgres
+PRODUCTS_COLUMNAR_CATALOG = True
+
 RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID")
 RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
 
@@ -310,6 +333,7 @@ CORS_ALLOW_HEADERS = [
     "user-agent",
     "x-csrftoken",
     "x-requested-with",
+    "idempotency-key",
 ]
 
 CORS_ALLOW_METHODS = [
@@ -321,6 +345,10 @@ CORS_ALLOW_METHODS = [
     "OPTIONS",
 ]
  
+# Reads come from the cache, writes still go to django_session so admin
+# and auth sessions stay revocable. Guests only get a session once their
+# cart has something in it (see orders.views.cart.get_or_create_cart)
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
 SESSION_COOKIE_SAMESITE = "Lax"
 SESSION_COOKIE_SECURE = False  # True only in HTTPS
  
@@ -80,28 +80,60 @@ export async function registerWorkshop(payload: {
 /* =========================
    PRODUCTS
 ========================= */
+
+// Product content is cached for hours and carries no stock; live stock
+// comes from the availability endpoint (at most 100 ids per request).
+const AVAILABILITY_BATCH = 100;
+
+interface Availability {
+  id: string;
+  stock: number;
+  available: number;
+  price: number;
+}
+
+async function withStock(products: Omit<Product, "stock">[]): Promise<Product[]> {
+  const stock: Record<string, number> = {};
+
+  for (let i = 0; i < products.length; i += AVAILABILITY_BATCH) {
+    const ids = products.slice(i, i + AVAILABILITY_BATCH).map((p) => p.id);
+    const res = await fetch(
+      `${API_BASE}/products/availability/?ids=${ids.map(encodeURIComponent).join(",")}`,
+      { cache: "no-store" }
+    );
+
+    if (!res.ok) {
+      throw new Error("Failed to fetch availability");
+    }
+
+    const rows: Availability[] = await res.json();
+    rows.forEach((row) => {
+      stock[row.id] = row.stock;
+    });
+  }
+
+  return products.map((p) => ({ ...p, stock: stock[p.id] ?? 0 }));
+}
+
 export async function fetchProducts(): Promise<Product[]> {
-  const res = await fetch(`${API_BASE}/products/`, {
-    cache: "no-store",
-  });
+  const res = await fetch(`${API_BASE}/products/`);
 
   if (!res.ok) {
     throw new Error("Failed to fetch products");
   }
 
-  return res.json();
+  return withStock(await res.json());
 }
 
 export async function fetchProductById(id: string): Promise<Product> {
-  const res = await fetch(`${API_BASE}/products/${id}/`, {
-    cache: "no-store",
-  });
+  const res = await fetch(`${API_BASE}/products/${id}/`);
 
   if (!res.ok) {
     throw new Error("Product not found");
   }
 
-  return res.json();
+  const [product] = await withStock([await res.json()]);
+  return product;
 }
 
 /* =========================